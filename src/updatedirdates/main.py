@@ -2,6 +2,8 @@
 """Main module for UpdateDirDates application."""
 
 import argparse
+import contextlib
+import math
 import os
 import sys
 import time
@@ -11,7 +13,10 @@ from typing import List
 import colorama
 from colorama import Fore, Style
 
-from .updater import DirectoryUpdater
+from .updater import DEFAULT_STAT_WORKERS, DirectoryUpdater
+
+# Status lines are written to the terminal in blocks of up to this many
+OUTPUT_BUFFER_LINES = 64
 
 
 def setup_colorama() -> None:
@@ -19,6 +24,28 @@ def setup_colorama() -> None:
     colorama.init(autoreset=True)
 
 
+def non_negative_seconds(value: str) -> float:
+    """Parse a --tolerance value, rejecting negative and non-finite numbers."""
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number of seconds: {value!r}")
+    if not math.isfinite(seconds) or seconds < 0:
+        raise argparse.ArgumentTypeError(f"must be a non-negative number of seconds: {value!r}")
+    return seconds
+
+
+def positive_int(value: str) -> int:
+    """Parse a count that must be at least 1, such as --stat-threads."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value!r}")
+    return number
+
+
 def create_parser() -> argparse.ArgumentParser:
     """Create and configure the argument parser."""
     parser = argparse.ArgumentParser(
@@ -54,6 +81,55 @@ Examples:
         help="Verbosity level: 0=quiet, 1=first level dirs, 2=all dirs, 3=all dirs+source files (default: 0)",
     )
     
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        metavar="FILE",
+        help="Keep scan results in FILE and skip re-reading directories whose mtime is "
+             "unchanged since the last run (in-place edits to existing files are not detected)",
+    )
+    
+    parser.add_argument(
+        "--tolerance",
+        type=non_negative_seconds,
+        default=0.0,
+        metavar="SECONDS",
+        help="Leave a directory alone if its date is within SECONDS of its newest file "
+             "(default: 0, exact match). A directory on a filesystem with coarse timestamps "
+             "(e.g. FAT, 2 s) holding newer files from a finer-grained mount cannot store "
+             "their exact time and is reported on every run unless this is set",
+    )
+    
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Ignore files and directories whose name matches the shell-style PATTERN "
+             "(e.g. .git, node_modules, '*.tmp'); may be given more than once",
+    )
+    
+    parser.add_argument(
+        "--one-file-system",
+        action="store_true",
+        help="Don't descend into directories on other filesystems (mount points)",
+    )
+    
+    parser.add_argument(
+        "--stat-threads",
+        type=positive_int,
+        default=DEFAULT_STAT_WORKERS,
+        metavar="N",
+        help=f"Scan up to N directories at once (default: {DEFAULT_STAT_WORKERS}; 1 disables threading)",
+    )
+    
+    parser.add_argument(
+        "--fast-stat",
+        action="store_true",
+        help="On Linux, read file dates with statx(AT_STATX_DONT_SYNC), which lets network "
+             "filesystems answer from cached attributes (dates may be slightly stale)",
+    )
+    
     parser.add_argument(
         "--version",
         action="version",
@@ -126,6 +202,13 @@ def main() -> int:
         print_error=print_error,
         print_warning=print_warning,
         print_success=print_success,
+        cache_file=args.cache,
+        tolerance=args.tolerance,
+        buffer_lines=OUTPUT_BUFFER_LINES,
+        fast_stat=args.fast_stat,
+        exclude=args.exclude,
+        one_file_system=args.one_file_system,
+        stat_workers=args.stat_threads,
     )
     
     # Process directories
@@ -138,12 +221,20 @@ def main() -> int:
             total_changes += changes
             
     except KeyboardInterrupt:
+        # Let status lines still queued for output appear before the message
+        with contextlib.suppress(Exception):
+            updater.flush_logs()
         print_error("Operation interrupted by user")
         return 130
         
     except Exception as e:
+        with contextlib.suppress(Exception):
+            updater.flush_logs()
         print_error(f"Unexpected error: {e}")
         return 1
+        
+    finally:
+        updater.close()
     
     # Print final statistics
     execution_time = time.time() - start_time
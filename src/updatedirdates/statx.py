@@ -0,0 +1,120 @@
+"""Cheap lstat() through Linux statx(), for use on network filesystems."""
+
+import ctypes
+import errno
+import os
+import sys
+from typing import Callable, Optional
+
+AT_FDCWD = -100
+AT_SYMLINK_NOFOLLOW = 0x100
+AT_STATX_DONT_SYNC = 0x4000
+
+STATX_TYPE = 0x1
+STATX_MODE = 0x2
+STATX_MTIME = 0x40
+
+# errno values from the probe call meaning statx() itself can't be used: an old
+# kernel (ENOSYS), a seccomp filter (EPERM) or unsupported flags (EINVAL)
+STATX_UNSUPPORTED_ERRNOS = frozenset({errno.ENOSYS, errno.EPERM, errno.EINVAL})
+
+
+class _StatxTimestamp(ctypes.Structure):
+    _fields_ = [
+        ("tv_sec", ctypes.c_int64),
+        ("tv_nsec", ctypes.c_uint32),
+        ("__reserved", ctypes.c_int32),
+    ]
+
+
+class _Statx(ctypes.Structure):
+    """struct statx from <linux/stat.h>."""
+
+    _fields_ = [
+        ("stx_mask", ctypes.c_uint32),
+        ("stx_blksize", ctypes.c_uint32),
+        ("stx_attributes", ctypes.c_uint64),
+        ("stx_nlink", ctypes.c_uint32),
+        ("stx_uid", ctypes.c_uint32),
+        ("stx_gid", ctypes.c_uint32),
+        ("stx_mode", ctypes.c_uint16),
+        ("__spare0", ctypes.c_uint16),
+        ("stx_ino", ctypes.c_uint64),
+        ("stx_size", ctypes.c_uint64),
+        ("stx_blocks", ctypes.c_uint64),
+        ("stx_attributes_mask", ctypes.c_uint64),
+        ("stx_atime", _StatxTimestamp),
+        ("stx_btime", _StatxTimestamp),
+        ("stx_ctime", _StatxTimestamp),
+        ("stx_mtime", _StatxTimestamp),
+        ("stx_rdev_major", ctypes.c_uint32),
+        ("stx_rdev_minor", ctypes.c_uint32),
+        ("stx_dev_major", ctypes.c_uint32),
+        ("stx_dev_minor", ctypes.c_uint32),
+        ("__spare2", ctypes.c_uint64 * 14),
+    ]
+
+
+def _load_statx() -> Callable[..., os.stat_result]:
+    """Bind statx() from the C library.
+
+    Returns:
+        An lstat()-like function returning only st_mode, st_ino, st_dev and the
+        modification time
+
+    Raises:
+        OSError: If statx() is not available on this platform, or the kernel
+            refuses a probe call on the root directory
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError("statx() is only available on Linux")
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        statx = libc.statx
+    except (OSError, AttributeError) as e:
+        raise OSError(f"statx() is not available: {e}") from e
+
+    statx.argtypes = [
+        ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_uint, ctypes.POINTER(_Statx)
+    ]
+    statx.restype = ctypes.c_int
+    flags = AT_SYMLINK_NOFOLLOW | AT_STATX_DONT_SYNC
+    mask = STATX_TYPE | STATX_MODE | STATX_MTIME
+
+    def fast_lstat(path: str, dir_fd: Optional[int] = None) -> os.stat_result:
+        buf = _Statx()
+        dirfd = AT_FDCWD if dir_fd is None else dir_fd
+        if statx(dirfd, os.fsencode(path), flags, mask, ctypes.byref(buf)) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        mtime_ns = buf.stx_mtime.tv_sec * 1_000_000_000 + buf.stx_mtime.tv_nsec
+        dev = os.makedev(buf.stx_dev_major, buf.stx_dev_minor)
+        return os.stat_result(
+            (buf.stx_mode, buf.stx_ino, dev, 0, 0, 0, 0, 0, buf.stx_mtime.tv_sec, 0),
+            {"st_mtime": mtime_ns / 1_000_000_000, "st_mtime_ns": mtime_ns},
+        )
+
+    try:
+        fast_lstat("/")
+    except OSError as e:
+        if e.errno in STATX_UNSUPPORTED_ERRNOS:
+            raise OSError(f"statx() is not usable: {e}") from e
+    return fast_lstat
+
+
+def get_fast_lstat() -> Callable[..., os.stat_result]:
+    """Return the cheapest available lstat().
+
+    On Linux this asks statx() for just the file type, mode and mtime, with
+    AT_STATX_DONT_SYNC so network filesystems may answer from cached attributes
+    instead of contacting the server. The result can therefore be slightly
+    stale. Elsewhere it falls back to os.lstat().
+
+    Returns:
+        Function taking a path and optional dir_fd, like os.lstat(), and
+        returning its os.stat_result without following symlinks
+    """
+    try:
+        return _load_statx()
+    except OSError:
+        return os.lstat
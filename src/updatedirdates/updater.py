@@ -1,11 +1,244 @@
 """Directory date updater implementation."""
 
+import fnmatch
+import functools
+import json
+import math
 import os
+import queue
+import re
 import stat
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Any, Callable, Optional, Sequence, Union
 
-from colorama import Fore
+from colorama import Fore, Style
+
+from .statx import get_fast_lstat
+
+# Pending directories are only scanned on the thread pool when more than this
+# many are waiting; below it the executor overhead outweighs the gain.
+PARALLEL_MIN_FANOUT = 4
+
+# Default number of worker threads scanning directories. Scans mostly wait on
+# the filesystem, so more threads than CPUs still help on disks and network
+# mounts with deep request queues.
+DEFAULT_STAT_WORKERS = 8
+
+# Upper bound on directory scans queued on the thread pool at once, so a huge
+# tree cannot flood a slow filesystem with requests.
+MAX_SCANS_IN_FLIGHT = 32
+
+# Queued updates are applied once this many are pending. Each directory still
+# gets its own utime() call, so this does not save syscalls; it only bounds how
+# many updates (and their "Updated" lines) wait in the queue at once.
+UTIME_BATCH_SIZE = 16
+
+NS_PER_SECOND = 1_000_000_000
+
+# should_update_directory() remembers up-to-date trees until its records cover
+# this many directories in total, then starts over.
+UP_TO_DATE_MAX_DIRS = 100_000
+
+# A quiet dry run of a tree with at least this many directories folds the
+# totals with numpy, when installed; below it building the arrays costs more
+# than the Python loop.
+NUMPY_MIN_DIRS = 50_000
+
+# strftime() format for the dates shown in status lines
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Summary line printed by print_statistics(), keyed by (dry_run, count) with
+# every count above 1 looked up as 2
+STATISTICS_MESSAGES = {
+    (True, 0): "No directory dates need updating.",
+    (True, 1): "1 directory date would be updated.",
+    (True, 2): "{count} directory dates would be updated.",
+    (False, 0): "No directory dates needed updating.",
+    (False, 1): "1 directory date was updated.",
+    (False, 2): "{count} directory dates were updated.",
+}
+
+# Bumped whenever the layout of cache file entries changes
+CACHE_VERSION = 3
+
+# Buffered status lines are also written out once this many seconds have passed
+# since the last write, so progress stays visible on a slow tree.
+OUTPUT_FLUSH_INTERVAL = 0.1
+
+# Buffered output is written by a separate thread so a slow terminal does not
+# hold up the scan; the scan only waits once this many writes are pending.
+OUTPUT_QUEUE_SIZE = 64
+
+# Where supported, each directory is listed through a file descriptor and its
+# entries are stat'd relative to it, so the kernel resolves a single name per
+# entry instead of the full path from the root. O_PATH descriptors cannot be
+# listed, so the directory is opened for reading.
+SCANDIR_FD = os.scandir in os.supports_fd and os.stat in os.supports_dir_fd
+DIR_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0)
+
+
+def compile_excludes(patterns: Optional[Sequence[str]]) -> Optional[re.Pattern[str]]:
+    """Combine shell-style name patterns into one regular expression.
+    
+    Args:
+        patterns: fnmatch patterns such as ".git" or "*.tmp"
+        
+    Returns:
+        Compiled pattern matching any of them, or None if there are none
+    """
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+
+
+@functools.cache
+def _load_numpy() -> Any:
+    """Import numpy on first use, so normal runs don't pay for it.
+    
+    Returns:
+        The numpy module, or None if it is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def scan_entries(
+    path: str,
+    lstat: Optional[Callable[..., os.stat_result]] = None,
+    exclude: Optional[re.Pattern[str]] = None,
+) -> tuple[list[tuple[str, os.stat_result]], int, Optional[str], int, list[tuple[str, bool, OSError]]]:
+    """Read a single directory level with one os.scandir pass.
+    
+    This is the inner loop of every scan. It only makes syscalls and compares
+    integers, and does no reporting, so it is safe to call from worker threads.
+    
+    Args:
+        path: Directory to scan
+        lstat: Replacement for DirEntry.stat(follow_symlinks=False), called like
+            os.lstat(name, dir_fd=fd) when listing by descriptor, otherwise with
+            each entry's full path and dir_fd=None
+        exclude: Entries whose name matches are skipped without being stat'd
+            
+    Returns:
+        Tuple of (subdirectories, newest_file_mtime_ns, newest_file_path,
+        file_count, entry_errors); subdirectories pairs each path with its lstat
+        result, and entry_errors lists (path, is_directory, error) for entries
+        that could not be stat'd
+        
+    Raises:
+        OSError: If the directory cannot be opened or listed
+    """
+    subdirs: list[tuple[str, os.stat_result]] = []
+    entry_errors = []
+    newest_mtime = 0
+    source_path = None
+    file_count = 0
+    
+    # Bound once here rather than looked up for every entry
+    add_subdir = subdirs.append
+    is_dir = stat.S_ISDIR
+    is_link = stat.S_ISLNK
+    
+    if SCANDIR_FD:
+        # Entries listed from a descriptor carry only their name in .path
+        dir_fd = os.open(path, DIR_OPEN_FLAGS)
+        listing: Union[int, str] = dir_fd
+        prefix = path if path.endswith(os.sep) else path + os.sep
+    else:
+        dir_fd = None
+        listing = path
+        prefix = ""
+        
+    try:
+        with os.scandir(listing) as entries:
+            for entry in entries:
+                if exclude is not None and exclude.match(entry.name):
+                    continue
+                    
+                # One lstat per entry decides its type and supplies its mtime
+                try:
+                    if lstat is None:
+                        entry_stat = entry.stat(follow_symlinks=False)
+                    else:
+                        entry_stat = lstat(entry.path, dir_fd=dir_fd)
+                    mode = entry_stat.st_mode
+                    if is_dir(mode):
+                        # Captured here so the directory is never stat'd again
+                        add_subdir((prefix + entry.path, entry_stat))
+                        continue
+                    if is_link(mode):
+                        # A symlinked file counts with its target's mtime;
+                        # symlinks to directories are not followed, as with os.walk
+                        entry_stat = entry.stat()
+                        if is_dir(entry_stat.st_mode):
+                            continue
+                except (OSError, IOError) as e:
+                    entry_errors.append((prefix + entry.path, entry.is_dir(follow_symlinks=False), e))
+                    continue
+                    
+                entry_mtime = entry_stat.st_mtime_ns
+                if entry_mtime > newest_mtime:
+                    newest_mtime = entry_mtime
+                    source_path = prefix + entry.path
+                file_count += 1
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+            
+    return subdirs, newest_mtime, source_path, file_count, entry_errors
+
+
+@dataclass
+class CollectedTree:
+    """Directory tree gathered in a single traversal.
+    
+    Each directory is stored at one index across parallel lists. A directory is
+    always added after its parent, so walking the indices in reverse visits every
+    child before its parent. A directory's own mtime is captured once, from its
+    parent's DirEntry, and is only reused within the same run. Times are integer
+    nanoseconds (st_mtime_ns) so they compare and round-trip exactly.
+    """
+    
+    paths: list[str] = field(default_factory=list)
+    parent: list[int] = field(default_factory=list)
+    depth: list[int] = field(default_factory=list)
+    mtime: list[int] = field(default_factory=list)
+    newest_mtime: list[int] = field(default_factory=list)
+    source: list[Optional[str]] = field(default_factory=list)
+    file_count: list[int] = field(default_factory=list)
+    dir_count: list[int] = field(default_factory=list)
+    readable: list[bool] = field(default_factory=list)
+    
+    def add(self, path: str, parent: int, depth: int, mtime: int) -> int:
+        """Append a directory with empty totals and return its index."""
+        self.paths.append(path)
+        self.parent.append(parent)
+        self.depth.append(depth)
+        self.mtime.append(mtime)
+        self.newest_mtime.append(0)
+        self.source.append(None)
+        self.file_count.append(0)
+        self.dir_count.append(0)
+        self.readable.append(True)
+        return len(self.paths) - 1
+        
+    def fold(self, index: int) -> None:
+        """Fold a directory's subtree totals into its parent's."""
+        parent = self.parent[index]
+        if parent < 0:
+            return
+        self.file_count[parent] += self.file_count[index]
+        if self.newest_mtime[index] > self.newest_mtime[parent]:
+            self.newest_mtime[parent] = self.newest_mtime[index]
+            self.source[parent] = self.source[index]
 
 
 class DirectoryUpdater:
@@ -19,6 +252,13 @@ class DirectoryUpdater:
         print_error: Optional[Callable[[str], None]] = None,
         print_warning: Optional[Callable[[str], None]] = None,
         print_success: Optional[Callable[[str], None]] = None,
+        cache_file: Optional[Path] = None,
+        tolerance: float = 0.0,
+        buffer_lines: int = 0,
+        fast_stat: bool = False,
+        exclude: Optional[Sequence[str]] = None,
+        one_file_system: bool = False,
+        stat_workers: int = DEFAULT_STAT_WORKERS,
     ):
         """Initialize the DirectoryUpdater.
         
@@ -29,173 +269,730 @@ class DirectoryUpdater:
             print_error: Function to print error messages
             print_warning: Function to print warning messages
             print_success: Function to print success messages
+            cache_file: JSON file of scan results kept between runs; a directory
+                whose mtime is unchanged since it was cached is not read again
+            tolerance: Seconds a directory's mtime may differ from its newest file
+                before it is updated (0 requires an exact match)
+            buffer_lines: Status lines to collect before passing them to
+                print_colored as a single block (0 prints each line immediately)
+            fast_stat: Stat entries with statx(AT_STATX_DONT_SYNC) where available,
+                accepting possibly stale mtimes on network filesystems
+            exclude: Shell-style patterns; files and directories whose name
+                matches one are ignored, and excluded directories are not entered
+            one_file_system: If True, don't descend into directories on a
+                different filesystem from the root being processed
+            stat_workers: Threads used to scan directories concurrently (1 scans
+                on the calling thread only)
+                
+        Raises:
+            ValueError: If tolerance is negative or not finite
         """
+        if not math.isfinite(tolerance) or tolerance < 0:
+            raise ValueError(f"tolerance must be a non-negative number of seconds, not {tolerance!r}")
         self.verbosity = verbosity
         self.dry_run = dry_run
+        self.tolerance_ns = round(tolerance * NS_PER_SECOND)
+        self._lstat = get_fast_lstat() if fast_stat else None
+        self._exclude = compile_excludes(exclude)
+        self.one_file_system = one_file_system
+        self.stat_workers = stat_workers
         self.print_colored = print_colored or self._default_print
         self.print_error = print_error or self._default_print
         self.print_warning = print_warning or self._default_print
         self.print_success = print_success or self._default_print
+        if buffer_lines:
+            # Errors and warnings must not overtake status lines still buffered
+            self.print_error = self._flushing(self.print_error)
+            self.print_warning = self._flushing(self.print_warning)
+        self.buffer_lines = buffer_lines
+        self._out_buf: list[str] = []
+        self._out_flushed_at = time.monotonic()
+        self._out_queue: Optional[queue.Queue] = None
+        self._out_thread: Optional[threading.Thread] = None
+        self._out_error: Optional[BaseException] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._print_lock = threading.RLock()
+        self._last_formatted: tuple[Optional[int], str] = (None, "")
+        self._pending_updates: list[tuple[str, int]] = []
+        self._up_to_date: dict[str, tuple[list[tuple[str, int]], tuple]] = {}
+        self._up_to_date_dirs = 0
+        self.cache_file = cache_file
+        self._scan_cache: dict[str, list] = self._load_cache() if cache_file else {}
         
     def _default_print(self, message: str, color: str = "") -> None:
         """Default print function."""
         print(message)
         
-    def get_latest_modification_time(self, directory: Path) -> tuple[float, int, int, Optional[Path]]:
-        """Get the latest modification time from all files in directory and subdirectories.
-        Only considers file modification times, not directory timestamps (per specs).
+    def _flushing(self, print_func: Callable[[str], None]) -> Callable[[str], None]:
+        """Wrap a print function so buffered status lines are written first."""
+        def print_after_flush(message: str) -> None:
+            with self._print_lock:
+                self._flush_output()
+                self._write(print_func, message)
+        return print_after_flush
+        
+    def _write(self, print_func: Callable[..., None], *args: str) -> None:
+        """Hand a print call to the output thread, starting it on first use.
+        
+        Calls are made in the order they were queued.
         
         Args:
-            directory: Directory to scan recursively
+            print_func: Print function to call
+            *args: Arguments for print_func
+        """
+        if self._out_queue is None:
+            self._out_queue = queue.Queue(maxsize=OUTPUT_QUEUE_SIZE)
+            self._out_thread = threading.Thread(
+                target=self._output_worker, args=(self._out_queue,), daemon=True
+            )
+            self._out_thread.start()
+        self._out_queue.put((print_func, args))
+        
+    def _output_worker(self, out_queue: queue.Queue) -> None:
+        """Make the queued print calls until a None item arrives."""
+        while True:
+            item = out_queue.get()
+            try:
+                if item is None:
+                    return
+                print_func, args = item
+                if self._out_error is None:
+                    print_func(*args)
+            except BaseException as e:
+                # Kept for flush_logs(); later output is dropped
+                self._out_error = e
+            finally:
+                out_queue.task_done()
+                
+    def flush_logs(self) -> None:
+        """Write out all buffered status lines and wait until they are printed.
+        
+        Raises:
+            BaseException: Whatever a print function raised on the output thread
+        """
+        self._flush_output()
+        if self._out_queue is not None:
+            self._out_queue.join()
+        if self._out_error is not None:
+            error, self._out_error = self._out_error, None
+            raise error
+        
+    def _emit(self, message: str, color: str = "") -> None:
+        """Print a status line, or add it to the output buffer if buffering.
+        
+        Buffered lines carry their own color codes and are written together by
+        _flush_output(), which turns many small stdout writes into a few large
+        ones.
+        
+        Args:
+            message: Line to print
+            color: Color prefix for the line
+        """
+        if not self.buffer_lines:
+            self.print_colored(message, color)
+            return
             
+        with self._print_lock:
+            self._out_buf.append(f"{color}{message}{Style.RESET_ALL}" if color else message)
+            if (
+                len(self._out_buf) >= self.buffer_lines
+                or time.monotonic() - self._out_flushed_at >= OUTPUT_FLUSH_INTERVAL
+            ):
+                self._flush_output()
+                
+    def _flush_output(self) -> None:
+        """Write any buffered status lines as one block."""
+        with self._print_lock:
+            if self._out_buf:
+                block = "\n".join(self._out_buf)
+                self._out_buf.clear()
+                self._write(self.print_colored, block, "")
+            self._out_flushed_at = time.monotonic()
+        
+    def _load_cache(self) -> dict[str, list]:
+        """Load cached scan results from the cache file.
+        
         Returns:
-            Tuple of (latest_modification_time, dir_count, file_count, source_file_path)
+            Mapping of directory path to [dir_mtime, newest_mtime, source_name,
+            file_count, subdir_names]; empty if the file is missing or unreadable
         """
-        latest_time = 0.0
-        total_dir_count = 0
-        total_file_count = 0
-        source_file = None
+        if self.cache_file is None:
+            return {}
+            
+        try:
+            with open(self.cache_file, encoding="utf-8") as f:
+                data = json.load(f)
+            # Entries written in an older layout or with different exclusions
+            # are simply rebuilt
+            if data["version"] != CACHE_VERSION or data["exclude"] != self._exclude_key():
+                return {}
+            directories = data["directories"]
+            if not isinstance(directories, dict):
+                raise TypeError(f"directories is a {type(directories).__name__}, not an object")
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.print_warning(f"Ignoring unreadable cache file {self.cache_file}: {e}")
+            return {}
+            
+        # A hand-edited or damaged entry is dropped, so its directory is rescanned
+        valid = {path: entry for path, entry in directories.items() if self._is_cache_entry(entry)}
+        if len(valid) < len(directories):
+            self.print_warning(
+                f"Ignoring unreadable cache entries in {self.cache_file}: "
+                f"{len(directories) - len(valid)} malformed"
+            )
+        return valid
+        
+    def _is_cache_entry(self, entry: Any) -> bool:
+        """Return True if entry has the five-field layout _load_cache() documents."""
+        if not isinstance(entry, list) or len(entry) != 5:
+            return False
+        dir_mtime, newest_mtime, source_name, file_count, subdir_names = entry
+        return (
+            isinstance(dir_mtime, int)
+            and isinstance(newest_mtime, int)
+            and (source_name is None or isinstance(source_name, str))
+            and isinstance(file_count, int)
+            and isinstance(subdir_names, list)
+            and all(isinstance(name, str) for name in subdir_names)
+        )
+            
+    def save_cache(self) -> None:
+        """Write the scan cache back to the cache file, if one is configured."""
+        if not self.cache_file:
+            return
+            
+        temp_file = f"{self.cache_file}.tmp"
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": CACHE_VERSION,
+                        "exclude": self._exclude_key(),
+                        "directories": self._scan_cache,
+                    },
+                    f,
+                )
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            self.print_error(f"Failed to write cache file {self.cache_file}: {e}")
+            
+    def _exclude_key(self) -> Optional[str]:
+        """Return the exclusions in the form recorded in the cache file."""
+        return self._exclude.pattern if self._exclude is not None else None
+        
+    def _scan_directory(
+        self, path: str, dir_mtime: int
+    ) -> tuple[list[tuple[str, os.stat_result]], int, Optional[str], int, Optional[OSError]]:
+        """Read a single directory level with scan_entries() and report entry errors.
         
+        A directory whose mtime still matches its cache entry has had no entries
+        added, removed or renamed, so the cached listing is reused instead. Safe
+        to call from worker threads.
+        
+        Args:
+            path: Directory to scan
+            dir_mtime: Current mtime of the directory in nanoseconds
+            
+        Returns:
+            Tuple of (subdirectories, newest_file_mtime, newest_file_path,
+            file_count, error); subdirectories pairs each path with its stat
+            result, and error is set if the directory could not be read
+        """
+        cached = self._scan_cache.get(path)
+        if cached is not None and cached[0] == dir_mtime:
+            return self._scan_from_cache(path, cached)
+            
         try:
-            # Use os.walk to recursively find all files
-            for root, dirs, files in os.walk(directory):
-                root_path = Path(root)
+            subdirs, newest_mtime, source_path, file_count, entry_errors = scan_entries(
+                path, self._lstat, self._exclude
+            )
+        except (OSError, IOError) as e:
+            return [], 0, None, 0, e
+            
+        for entry_path, is_directory, error in entry_errors:
+            if is_directory:
+                with self._print_lock:
+                    self.print_error(f"Error checking directory {entry_path}: {error}")
+            elif self.verbosity >= 2:
+                with self._print_lock:
+                    self.print_warning(f"Could not stat file {entry_path}: {error}")
+                    
+        return subdirs, newest_mtime, source_path, file_count, None
+        
+    def _scan_from_cache(
+        self, path: str, cached: list
+    ) -> tuple[list[tuple[str, os.stat_result]], int, Optional[str], int, Optional[OSError]]:
+        """Rebuild a scan result from a cache entry, stat'ing only the subdirectories.
+        
+        Args:
+            path: Directory the entry belongs to
+            cached: Cache entry for the directory
+            
+        Returns:
+            Same tuple as _scan_directory()
+        """
+        _, newest_mtime, source_name, file_count, subdir_names = cached
+        subdirs: list[tuple[str, os.stat_result]] = []
+        for name in subdir_names:
+            subdir = os.path.join(path, name)
+            try:
+                subdirs.append((subdir, (self._lstat or os.lstat)(subdir)))
+            except (OSError, IOError) as e:
+                with self._print_lock:
+                    self.print_error(f"Error checking directory {subdir}: {e}")
+                    
+        source_path = os.path.join(path, source_name) if source_name is not None else None
+        return subdirs, newest_mtime, source_path, file_count, None
+        
+    def collect_tree(
+        self, directory: Union[str, os.PathLike[str]], root_stat: Optional[os.stat_result] = None
+    ) -> CollectedTree:
+        """Scan a directory tree once, recording per-directory file totals.
+        
+        The newest mtime and file count stored for each directory only cover the
+        files directly inside it; CollectedTree.fold() accumulates subtree totals.
+        
+        Once more than PARALLEL_MIN_FANOUT directories are waiting, scans run as
+        a pipeline on the thread pool: up to MAX_SCANS_IN_FLIGHT are queued, and
+        each finished scan immediately queues its subdirectories, so listing one
+        directory overlaps with statting the files of others. Results are taken
+        in the order scans were started, which keeps the tree's order stable.
+        
+        Args:
+            directory: Root of the tree to scan
+            root_stat: Stat result the caller already holds for directory
+            
+        Returns:
+            The collected tree, with the root at index 0
+            
+        Raises:
+            OSError: If the root directory itself cannot be read
+        """
+        tree = CollectedTree()
+        root = os.fspath(directory)
+        if root_stat is None:
+            root_stat = os.stat(root)
+        root_dev = root_stat.st_dev
+        pending: list[tuple[str, int, int, os.stat_result]] = [(root, -1, 0, root_stat)]
+        in_flight: deque[tuple[tuple[str, int, int, os.stat_result], Future]] = deque()
+        
+        while pending or in_flight:
+            # The scandir/stat syscalls release the GIL, so directories waiting
+            # at once are scanned concurrently
+            if in_flight or (len(pending) > PARALLEL_MIN_FANOUT and self.stat_workers > 1):
+                executor = self._get_executor()
+                while pending and len(in_flight) < MAX_SCANS_IN_FLIGHT:
+                    item = pending.pop()
+                    future = executor.submit(self._scan_directory, item[0], item[3].st_mtime_ns)
+                    in_flight.append((item, future))
+                item, future = in_flight.popleft()
+                result = future.result()
+            else:
+                item = pending.pop()
+                result = self._scan_directory(item[0], item[3].st_mtime_ns)
                 
-                # Count directories (only immediate subdirectories of the main directory)
-                if root_path == directory:
-                    total_dir_count = len(dirs)
+            path, parent, depth, dir_stat = item
+            subdirs, newest_mtime, source_path, file_count, error = result
+            if error is not None and parent < 0:
+                raise error
                 
-                # Process all files in this directory level
-                for filename in files:
-                    file_path = root_path / filename
-                    try:
-                        file_stat = file_path.stat()
-                        if file_stat.st_mtime > latest_time:
-                            latest_time = file_stat.st_mtime
-                            source_file = file_path
-                        total_file_count += 1
-                    except (OSError, IOError) as e:
-                        if self.verbosity >= 2:
-                            self.print_warning(f"Could not stat file {file_path}: {e}")
-                            
-        except (OSError, IOError) as e:
-            self.print_error(f"Error reading directory {directory}: {e}")
-            return directory.stat().st_mtime, 0, 0, None
+            index = tree.add(path, parent, depth, dir_stat.st_mtime_ns)
+            if error is not None:
+                tree.readable[index] = False
+                with self._print_lock:
+                    self.print_error(f"Error reading directory {path}: {error}")
+                continue
+                
+            if self.cache_file:
+                self._scan_cache[path] = [
+                    dir_stat.st_mtime_ns,
+                    newest_mtime,
+                    os.path.basename(source_path) if source_path is not None else None,
+                    file_count,
+                    [os.path.basename(subdir) for subdir, _ in subdirs],
+                ]
+            if self.one_file_system:
+                # Mount points are left out entirely, like find -xdev
+                subdirs = [subdir for subdir in subdirs if subdir[1].st_dev == root_dev]
+                
+            tree.newest_mtime[index] = newest_mtime
+            tree.source[index] = source_path
+            tree.file_count[index] = file_count
+            tree.dir_count[index] = len(subdirs)
+            pending.extend(
+                (subdir, index, depth + 1, subdir_stat) for subdir, subdir_stat in subdirs
+            )
             
-        return latest_time, total_dir_count, total_file_count, source_file
+        return tree
         
-    def should_update_directory(self, directory: Path) -> tuple[bool, float, float, int, int, Optional[Path]]:
-        """Check if directory needs updating and return relevant times and counts.
+    def get_latest_modification_time(
+        self, directory: Union[str, os.PathLike[str]], current_stat: Optional[os.stat_result] = None
+    ) -> tuple[int, int, int, Optional[Path]]:
+        """Get the latest modification time from all files in directory and subdirectories.
+        Only considers file modification times, not directory timestamps (per specs).
         
         Args:
-            directory: Directory to check
+            directory: Directory to scan recursively
+            current_stat: Stat result the caller already holds for directory, used
+                instead of a fresh stat() if the scan fails
+                
+        Returns:
+            Tuple of (latest_modification_time_ns, dir_count, file_count, source_file_path)
+        """
+        return self._scan_subtree(directory, current_stat)[:4]
+        
+    def _scan_subtree(
+        self, directory: Union[str, os.PathLike[str]], current_stat: Optional[os.stat_result] = None
+    ) -> tuple[int, int, int, Optional[Path], Optional[CollectedTree]]:
+        """Scan a tree like get_latest_modification_time(), also returning the tree.
+        
+        Args:
+            directory: Directory to scan recursively
+            current_stat: Stat result the caller already holds for directory
             
         Returns:
-            Tuple of (needs_update, current_time, latest_time, dir_count, file_count, source_file)
+            Tuple of (latest_modification_time_ns, dir_count, file_count,
+            source_file_path, tree), where tree is None if the scan failed
         """
+        directory = os.fspath(directory)
         try:
-            current_stat = directory.stat()
-            current_time = current_stat.st_mtime
-            latest_time, dir_count, file_count, source_file = self.get_latest_modification_time(directory)
+            tree = self.collect_tree(directory, current_stat)
+        except (OSError, IOError) as e:
+            with self._print_lock:
+                self.print_error(f"Error reading directory {directory}: {e}")
+            if current_stat is None:
+                current_stat = os.stat(directory)
+            return current_stat.st_mtime_ns, 0, 0, None, None
             
-            # Always update directory to match the newest file, regardless of current directory time
-            # Add a small tolerance (1 second) to avoid floating point precision issues with identical times
-            needs_update = abs(latest_time - current_time) > 1.0
+        for index in range(len(tree.paths) - 1, 0, -1):
+            tree.fold(index)
             
-            return needs_update, current_time, latest_time, dir_count, file_count, source_file
+        source_file = Path(tree.source[0]) if tree.source[0] is not None else None
+        return tree.newest_mtime[0], tree.dir_count[0], tree.file_count[0], source_file, tree
+        
+    def should_update_directory(
+        self, directory: Union[str, os.PathLike[str]], current_stat: Optional[os.stat_result] = None
+    ) -> tuple[bool, int, int, int, int, Optional[Path]]:
+        """Check if directory needs updating and return relevant times and counts.
+        
+        A directory found up to date is remembered with the mtime of every
+        directory in its tree. Asking again re-stats just those directories and,
+        if none has changed, returns the same answer without listing them; files
+        added, removed or renamed anywhere below are noticed, but like the scan
+        cache this does not notice files edited in place. The records are
+        dropped once they cover UP_TO_DATE_MAX_DIRS directories, and by close().
+        
+        Args:
+            directory: Directory to check
+            current_stat: Stat result the caller already holds for directory, e.g.
+                from a DirEntry; directory is stat'd when omitted
+                
+        Returns:
+            Tuple of (needs_update, current_time_ns, latest_time_ns, dir_count,
+            file_count, source_file)
+        """
+        directory = os.fspath(directory)
+        try:
+            if current_stat is None:
+                current_stat = os.stat(directory)
+            current_ns = current_stat.st_mtime_ns
+            known = self._up_to_date.get(directory)
+            if known is not None:
+                dir_mtimes, result = known
+                if dir_mtimes[0][1] == current_ns and self._dirs_unchanged(dir_mtimes[1:]):
+                    return result
+                del self._up_to_date[directory]
+                self._up_to_date_dirs -= len(dir_mtimes)
+                
+            latest_ns, dir_count, file_count, source_file, tree = self._scan_subtree(
+                directory, current_stat
+            )
+            needs_update = self._needs_update(current_ns, latest_ns)
             
+            result = (needs_update, current_ns, latest_ns, dir_count, file_count, source_file)
+            if not needs_update and tree is not None and len(tree.paths) <= UP_TO_DATE_MAX_DIRS:
+                if self._up_to_date_dirs + len(tree.paths) > UP_TO_DATE_MAX_DIRS:
+                    self._clear_up_to_date()
+                self._up_to_date[directory] = (list(zip(tree.paths, tree.mtime)), result)
+                self._up_to_date_dirs += len(tree.paths)
+            return result
+                        
         except (OSError, IOError) as e:
-            self.print_error(f"Error checking directory {directory}: {e}")
-            return False, 0.0, 0.0, 0, 0, None
+            with self._print_lock:
+                self.print_error(f"Error checking directory {directory}: {e}")
+            return False, 0, 0, 0, 0, None
+            
+    def _clear_up_to_date(self) -> None:
+        """Forget the trees should_update_directory() found up to date."""
+        self._up_to_date.clear()
+        self._up_to_date_dirs = 0
+        
+    def _dirs_unchanged(self, dir_mtimes: list[tuple[str, int]]) -> bool:
+        """Return True if every directory still exists with the recorded mtime."""
+        try:
+            return all(os.stat(path).st_mtime_ns == mtime_ns for path, mtime_ns in dir_mtimes)
+        except OSError:
+            return False
             
-    def update_directory_date(self, directory: Path, new_time: float) -> bool:
-        """Update directory modification time.
+    def _needs_update(self, current_ns: int, latest_ns: int) -> bool:
+        """Return whether a directory's mtime differs from its newest file's.
+        
+        Always update directory to match the newest file, regardless of current
+        directory time. Integer nanoseconds compare exactly, so no tolerance is
+        needed unless one was configured.
+        """
+        return abs(latest_ns - current_ns) > self.tolerance_ns
+        
+    def update_directory_date(self, directory: Union[str, os.PathLike[str]], new_time_ns: int) -> bool:
+        """Queue a directory modification time update.
+        
+        Nothing is written until flush_updates() is called; process_directory()
+        does this itself.
         
         Args:
             directory: Directory to update
-            new_time: New modification time
+            new_time_ns: New modification time in nanoseconds
             
         Returns:
-            True if update was successful
+            True once the update is queued (or immediately for a dry run)
         """
         if self.dry_run:
             return True
             
-        try:
-            # Update both access time and modification time
-            os.utime(directory, (new_time, new_time))
-            return True
-        except (OSError, IOError) as e:
-            self.print_error(f"Failed to update directory {directory}: {e}")
-            return False
+        self._pending_updates.append((os.fspath(directory), new_time_ns))
+        return True
             
-    def process_directory(self, root_directory: Path, depth: int = 0) -> int:
+    def process_directory(self, root_directory: Union[str, os.PathLike[str]], depth: int = 0) -> int:
         """Process a directory and all its subdirectories.
         
+        The tree is collected in a single traversal, then swept bottom-up so each
+        directory's totals are complete before it is checked. Both passes use
+        explicit stacks/indices, so tree depth is not bounded by the recursion limit.
+        Paths stay plain strings throughout; no Path objects are built per
+        directory. Updates are queued during the sweep and applied in batches of
+        UTIME_BATCH_SIZE, with the remainder flushed once the sweep completes. A
+        quiet dry run only needs the final count, so it takes the reduced sweep in
+        _count_updates().
+        
         Args:
             root_directory: Root directory to process
-            depth: Current depth for verbosity control
+            depth: Depth of root_directory for verbosity control
             
         Returns:
             Number of directories that were changed (or would be changed)
         """
-        changes_made = 0
-        
-        # Process all subdirectories first (bottom-up approach)
+        root_directory = os.fspath(root_directory)
         try:
-            subdirs = [d for d in root_directory.iterdir() if d.is_dir()]
-            for subdir in subdirs:
-                changes_made += self.process_directory(subdir, depth + 1)
+            tree = self.collect_tree(root_directory)
         except (OSError, IOError) as e:
             self.print_error(f"Error listing subdirectories in {root_directory}: {e}")
             return 0
             
-        # Now process the current directory
-        needs_update, current_time, latest_time, dir_count, file_count, source_file = self.should_update_directory(root_directory)
+        if self.dry_run and self.verbosity == 0:
+            return self._count_updates(tree)
+            
+        changes_made = 0
+        process_collected = self._process_collected
+        fold = tree.fold
+        readable = tree.readable
+        tree_depth = tree.depth
+        for index in range(len(tree.paths) - 1, -1, -1):
+            if readable[index]:
+                changes_made += process_collected(tree, index, depth + tree_depth[index])
+            fold(index)
+            
+        changes_made += self.flush_updates()
+        self.flush_logs()
+        return changes_made
+        
+    def _count_updates(self, tree: CollectedTree) -> int:
+        """Count the directories that would be updated, without any output.
+        
+        Same decision as _process_collected(), with the fold reduced to the
+        newest mtime and no per-directory method calls or formatting. Trees of
+        NUMPY_MIN_DIRS directories or more are folded with numpy if available.
+                
+        Args:
+            tree: Collected tree to sweep; its totals are left partly folded
+            
+        Returns:
+            Number of directories that would be changed
+        """
+        if len(tree.parent) >= NUMPY_MIN_DIRS:
+            np = _load_numpy()
+            if np is not None:
+                return self._count_updates_numpy(tree, np)
+                
+        parents = tree.parent
+        mtimes = tree.mtime
+        newest = tree.newest_mtime
+        readable = tree.readable
+        tolerance_ns = self.tolerance_ns
+        
+        count = 0
+        for index in range(len(parents) - 1, -1, -1):
+            latest_ns = newest[index]
+            if readable[index] and abs(latest_ns - mtimes[index]) > tolerance_ns:
+                count += 1
+            parent = parents[index]
+            if parent >= 0 and latest_ns > newest[parent]:
+                newest[parent] = latest_ns
+        return count
+        
+    def _count_updates_numpy(self, tree: CollectedTree, np: Any) -> int:
+        """Vectorized _count_updates() for very large trees.
+        
+        The newest mtimes are folded one depth level at a time, deepest first:
+        every directory at a level can be folded into its parent at once, since
+        none of them is another's parent.
+        
+        Args:
+            tree: Collected tree to sweep; it is left unchanged
+            np: The numpy module
+            
+        Returns:
+            Number of directories that would be changed
+        """
+        parents = np.array(tree.parent, dtype=np.int64)
+        depths = np.array(tree.depth, dtype=np.int64)
+        newest = np.array(tree.newest_mtime, dtype=np.int64)
+        
+        order = np.argsort(depths, kind="stable")
+        max_depth = int(depths[order[-1]])
+        level_starts = np.searchsorted(depths[order], np.arange(max_depth + 2))
+        for level in range(max_depth, 0, -1):
+            indices = order[level_starts[level]:level_starts[level + 1]]
+            np.maximum.at(newest, parents[indices], newest[indices])
+            
+        stale = np.abs(newest - np.array(tree.mtime, dtype=np.int64)) > self.tolerance_ns
+        return int(np.count_nonzero(stale & np.array(tree.readable, dtype=bool)))
+        
+    def _process_collected(self, tree: CollectedTree, index: int, depth: int) -> int:
+        """Check and update one collected directory whose subtree totals are complete.
+        
+        Args:
+            tree: Collected tree containing the directory
+            index: Index of the directory in the tree
+            depth: Depth of the directory for verbosity control
+            
+        Returns:
+            Number of directories changed (or that would be changed): 1 for a dry
+            run, otherwise the number applied if this filled a batch of updates
+        """
+        directory = tree.paths[index]
+        current_ns = tree.mtime[index]
+        latest_ns = tree.newest_mtime[index]
+        source_file = tree.source[index]
+        
+        verbosity = self.verbosity
+        dry_run = self.dry_run
+        needs_update = self._needs_update(current_ns, latest_ns)
         
         # Print directory status based on verbosity level
-        if self.verbosity >= 2 or (self.verbosity >= 1 and depth <= 1):
-            count_info = f" (dirs:{dir_count} files:{file_count})"
+        if verbosity >= 2 or (verbosity >= 1 and depth <= 1):
+            emit = self._emit
+            format_timestamp = self._format_timestamp
+            count_info = f" (dirs:{tree.dir_count[index]} files:{tree.file_count[index]})"
             if needs_update:
-                action = "Would update" if self.dry_run else "Updating"
-                self.print_colored(
-                    f"{action} {root_directory}: "
-                    f"{self._format_timestamp(current_time)} -> "
-                    f"{self._format_timestamp(latest_time)}{count_info}",
+                action = "Would update" if dry_run else "Updating"
+                current_text = format_timestamp(current_ns // NS_PER_SECOND)
+                latest_text = format_timestamp(latest_ns // NS_PER_SECOND)
+                if current_text == latest_text:
+                    # The times differ by less than a second, so show the part that differs
+                    current_text += f".{current_ns % NS_PER_SECOND:09d}"
+                    latest_text += f".{latest_ns % NS_PER_SECOND:09d}"
+                emit(
+                    f"{action} {directory}: {current_text} -> {latest_text}{count_info}",
                     Fore.CYAN
                 )
             else:
-                if self.verbosity >= 2 or (self.verbosity >= 1 and depth <= 1):
-                    self.print_colored(
-                        f"Directory OK: {root_directory} "
-                        f"({self._format_timestamp(current_time)}){count_info}",
-                        ""
-                    )
-            
-            # Print source file info for verbosity level 3
-            if self.verbosity >= 3:
+                emit(
+                    f"Directory OK: {directory} "
+                    f"({format_timestamp(current_ns // NS_PER_SECOND)}){count_info}",
+                    ""
+                )
+                
+            # Print source file info for verbosity level 3; the newest mtime was
+            # recorded from the source file itself, so it is not stat'd again
+            if verbosity >= 3:
                 if source_file:
-                    try:
-                        source_mtime = source_file.stat().st_mtime
-                        source_time_str = self._format_timestamp(source_mtime)
-                        source_info = f"{source_file} ({source_time_str})"
-                    except (OSError, IOError):
-                        source_info = f"{source_file} (timestamp unavailable)"
+                    source_info = f"{source_file} ({format_timestamp(latest_ns // NS_PER_SECOND)})"
                 else:
                     source_info = "none"
-                self.print_colored(f"  Source file: {source_info}", "")
-                    
-        # Update directory if needed
-        if needs_update:
-            if self.update_directory_date(root_directory, latest_time):
-                changes_made += 1
-                if not self.dry_run and self.verbosity >= 1:
-                    self.print_success(f"Updated {root_directory}")
-            else:
-                self.print_error(f"Failed to update {root_directory}")
+                emit(f"  Source file: {source_info}")
                 
-        return changes_made
+        # Update directory if needed; real updates are queued and applied together
+        if not needs_update:
+            return 0
+        if dry_run:
+            return 1
+        self.update_directory_date(directory, latest_ns)
+        if len(self._pending_updates) >= UTIME_BATCH_SIZE:
+            return self.flush_updates()
+        return 0
+        
+    def flush_updates(self) -> int:
+        """Apply the queued directory updates in one pass.
+        
+        Deeper directories are written first, so a parent is never touched
+        before one of its queued children.
+        
+        Returns:
+            Number of directories that were updated successfully
+        """
+        pending, self._pending_updates = self._pending_updates, []
+        sep = os.sep
+        pending.sort(key=lambda item: item[0].count(sep), reverse=True)
+        utime = os.utime
+        scan_cache = self._scan_cache
+        report = self.verbosity >= 1
+        print_success: Callable[[str], None]
+        if self.buffer_lines:
+            print_success = functools.partial(self._emit, color=Fore.GREEN)
+        else:
+            print_success = self.print_success
+            
+        updated = 0
+        for directory, new_time_ns in pending:
+            try:
+                # Update both access time and modification time
+                utime(directory, ns=(new_time_ns, new_time_ns))
+            except (OSError, IOError) as e:
+                with self._print_lock:
+                    self.print_error(f"Failed to update directory {directory}: {e}")
+                continue
+            updated += 1
+            cached = scan_cache.get(directory)
+            if cached is not None:
+                # Record the new mtime so the next run still gets a cache hit
+                cached[0] = new_time_ns
+            if report:
+                print_success(f"Updated {directory}")
+        return updated
         
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the shared thread pool, creating it on first use."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.stat_workers)
+        return self._executor
+        
+    def close(self) -> None:
+        """Write buffered output, save the scan cache and shut down the worker threads."""
+        try:
+            self.flush_logs()
+        finally:
+            if self._out_queue is not None and self._out_thread is not None:
+                self._out_queue.put(None)
+                self._out_thread.join()
+                self._out_queue = self._out_thread = None
+            self.save_cache()
+            self._clear_up_to_date()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+            
     def _format_timestamp(self, timestamp: float) -> str:
         """Format timestamp for display.
         
@@ -205,9 +1002,12 @@ class DirectoryUpdater:
         Returns:
             Formatted timestamp string
         """
-        import datetime
-        dt = datetime.datetime.fromtimestamp(timestamp)
-        return dt.strftime("%Y-%m-%d %H:%M:%S")
+        # Consecutive lines often share a timestamp (e.g. a directory and the
+        # newest file that dates it), so the last result is kept
+        second = math.floor(timestamp)
+        if self._last_formatted[0] != second:
+            self._last_formatted = (second, time.strftime(TIMESTAMP_FORMAT, time.localtime(second)))
+        return self._last_formatted[1]
         
     def print_statistics(self, total_changes: int, execution_time: float) -> None:
         """Print final statistics.
@@ -216,26 +1016,12 @@ class DirectoryUpdater:
             total_changes: Number of directories changed
             execution_time: Total execution time in seconds
         """
-        if self.dry_run:
-            if total_changes == 0:
-                self.print_success("No directory dates need updating.")
-            elif total_changes == 1:
-                self.print_colored(
-                    f"1 directory date would be updated.",
-                    Fore.CYAN
-                )
-            else:
-                self.print_colored(
-                    f"{total_changes} directory dates would be updated.",
-                    Fore.CYAN
-                )
+        message = STATISTICS_MESSAGES[(self.dry_run, min(total_changes, 2))].format(count=total_changes)
+        # Pending changes of a dry run are highlighted rather than reported as success
+        if self.dry_run and total_changes > 0:
+            self.print_colored(message, Fore.CYAN)
         else:
-            if total_changes == 0:
-                self.print_success("No directory dates needed updating.")
-            elif total_changes == 1:
-                self.print_success("1 directory date was updated.")
-            else:
-                self.print_success(f"{total_changes} directory dates were updated.")
-                
+            self.print_success(message)
+        
         if self.verbosity >= 1 or total_changes > 0:
             self.print_colored(f"Execution time: {execution_time:.2f} seconds", "")
\ No newline at end of file
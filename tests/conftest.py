@@ -0,0 +1,27 @@
+"""Shared pytest fixtures."""
+
+import pytest
+
+from .helpers import Recorder, UpdaterFactory
+
+
+@pytest.fixture(scope="session")
+def main_mod():
+    """The updatedirdates.main module, imported once for the session."""
+    import updatedirdates.main
+
+    return updatedirdates.main
+
+
+@pytest.fixture
+def recorder():
+    """A fresh Recorder for tests that need a single print callback."""
+    return Recorder()
+
+
+@pytest.fixture
+def updater_factory(main_mod, monkeypatch):
+    """An UpdaterFactory installed in place of main's DirectoryUpdater."""
+    factory = UpdaterFactory()
+    monkeypatch.setattr(main_mod, 'DirectoryUpdater', factory)
+    return factory
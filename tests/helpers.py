@@ -0,0 +1,96 @@
+"""Test doubles shared between test modules."""
+
+from typing import NamedTuple
+
+
+class Call(NamedTuple):
+    """Arguments of one recorded call, unpackable as (args, kwargs)."""
+
+    args: tuple
+    kwargs: dict
+
+
+class Recorder:
+    """Callable stand-in that records the arguments of every call.
+
+    A much cheaper replacement for Mock() as a print callback, with the few
+    Mock assertions the tests use.
+    """
+
+    def __init__(self, return_value=None):
+        self.calls = []
+        self.return_value = return_value
+
+    def __call__(self, *args, **kwargs):
+        self.calls.append(Call(args, kwargs))
+        return self.return_value
+
+    @property
+    def call_count(self):
+        return len(self.calls)
+
+    @property
+    def call_args(self):
+        return self.calls[-1] if self.calls else None
+
+    def assert_called(self):
+        assert self.calls, "expected at least one call"
+
+    def assert_called_once(self):
+        assert len(self.calls) == 1, f"expected one call, got {self.calls}"
+
+    def assert_called_once_with(self, *args, **kwargs):
+        assert self.calls == [Call(args, kwargs)], f"expected one call with {args}, got {self.calls}"
+
+    def assert_any_call(self, *args, **kwargs):
+        assert Call(args, kwargs) in self.calls, f"no call with {args} in {self.calls}"
+
+
+class FakeUpdater:
+    """Minimal DirectoryUpdater stand-in recording how main() used it."""
+
+    __slots__ = ("init_kwargs", "rv", "exc", "processed", "stats_printed", "logs_flushed", "closed")
+
+    def __init__(self, **kwargs):
+        self.init_kwargs = kwargs
+        self.rv = 0
+        self.exc = None
+        self.processed = []
+        self.stats_printed = False
+        self.logs_flushed = False
+        self.closed = False
+
+    def process_directory(self, directory):
+        self.processed.append(directory)
+        if self.exc is not None:
+            raise self.exc
+        return self.rv
+
+    def print_statistics(self, total_changes, execution_time):
+        self.stats_printed = True
+
+    def flush_logs(self):
+        self.logs_flushed = True
+
+    def close(self):
+        self.closed = True
+
+
+class UpdaterFactory:
+    """Stand-in for the DirectoryUpdater class that builds FakeUpdaters.
+
+    Every updater it creates returns rv from process_directory(), or raises
+    exc if set, and is kept in instances.
+    """
+
+    def __init__(self):
+        self.rv = 0
+        self.exc = None
+        self.instances = []
+
+    def __call__(self, **kwargs):
+        updater = FakeUpdater(**kwargs)
+        updater.rv = self.rv
+        updater.exc = self.exc
+        self.instances.append(updater)
+        return updater
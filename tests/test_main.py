@@ -3,97 +3,175 @@
 import argparse
 import sys
 from pathlib import Path
-from unittest.mock import Mock, patch
+from types import SimpleNamespace
 
 import pytest
+from colorama import Fore, Style
 
-from updatedirdates.main import (
-    create_parser,
-    main,
-    print_colored,
-    print_error,
-    print_success,
-    print_warning,
-    setup_colorama,
-    validate_directories,
-)
+from .helpers import Recorder
+
+
+@pytest.fixture(scope="module")
+def parser(main_mod):
+    """Parser shared by the parser tests; parse_args() keeps no state between calls."""
+    return main_mod.create_parser()
+
+
+@pytest.fixture(scope="module")
+def test_dir(tmp_path_factory):
+    """Empty directory to pass to main(); the tests never write into it."""
+    return tmp_path_factory.mktemp("main_test_dir")
+
+
+@pytest.fixture(scope="class")
+def noop_colorama(main_mod):
+    """Keep main() from initializing colorama, which rewraps sys.stdout."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main_mod, 'setup_colorama', lambda: None)
+        yield
+
+
+@pytest.fixture
+def set_argv(monkeypatch):
+    """Return a function replacing sys.argv for the rest of the test."""
+    def _set(argv):
+        monkeypatch.setattr(sys, 'argv', argv)
+    return _set
+
+
+@pytest.fixture
+def quiet_parser(parser, monkeypatch):
+    """The shared parser with help, version and error output discarded."""
+    monkeypatch.setattr(parser, '_print_message', lambda *args, **kwargs: None)
+    return parser
+
+
+@pytest.fixture(scope="module")
+def sample_paths(tmp_path_factory):
+    """Directories, a file and a missing path, built once for the validation tests.
+    
+    validate_directories() only reads the filesystem, so the layout is shared.
+    """
+    root = tmp_path_factory.mktemp("validate")
+    valid = root / "valid"
+    valid.mkdir()
+    other = root / "other"
+    other.mkdir()
+    invalid_file = root / "invalid.txt"
+    invalid_file.write_text("test")
+    return SimpleNamespace(
+        valid=valid, other=other, invalid_file=invalid_file, nonexistent=root / "nonexistent"
+    )
 
 
 class TestParser:
     """Test the argument parser."""
 
-    def test_create_parser_basic(self):
+    def test_create_parser_basic(self, main_mod):
         """Test parser creation with basic functionality."""
-        parser = create_parser()
+        parser = main_mod.create_parser()
         assert isinstance(parser, argparse.ArgumentParser)
 
-    def test_parser_help(self):
+    def test_parser_help(self, quiet_parser):
         """Test parser help output."""
-        parser = create_parser()
-        with pytest.raises(SystemExit):
-            parser.parse_args(["--help"])
+        with pytest.raises(SystemExit) as exc_info:
+            quiet_parser.parse_args(["--help"])
+        assert exc_info.value.code == 0
 
-    def test_parser_version(self):
+    def test_parser_version(self, quiet_parser):
         """Test parser version output."""
-        parser = create_parser()
-        with pytest.raises(SystemExit):
-            parser.parse_args(["--version"])
+        with pytest.raises(SystemExit) as exc_info:
+            quiet_parser.parse_args(["--version"])
+        assert exc_info.value.code == 0
 
-    def test_parser_required_directory(self):
+    def test_parser_required_directory(self, quiet_parser):
         """Test parser requires at least one directory."""
-        parser = create_parser()
-        with pytest.raises(SystemExit):
-            parser.parse_args([])
+        with pytest.raises(SystemExit) as exc_info:
+            quiet_parser.parse_args([])
+        assert exc_info.value.code == 2
 
-    def test_parser_single_directory(self, tmp_path):
+    def test_parser_single_directory(self, parser):
         """Test parser with single directory."""
-        parser = create_parser()
-        args = parser.parse_args([str(tmp_path)])
+        args = parser.parse_args(["/data/dir"])
         
         assert len(args.directories) == 1
-        assert args.directories[0] == tmp_path
+        assert args.directories[0] == Path("/data/dir")
         assert not args.execute
         assert args.verbosity == 0
 
-    def test_parser_multiple_directories(self, tmp_path):
+    def test_parser_multiple_directories(self, parser):
         """Test parser with multiple directories."""
-        dir1 = tmp_path / "dir1"
-        dir2 = tmp_path / "dir2"
-        dir1.mkdir()
-        dir2.mkdir()
-        
-        parser = create_parser()
-        args = parser.parse_args([str(dir1), str(dir2)])
+        # Paths are only checked for existence later, by validate_directories()
+        args = parser.parse_args(["/data/dir1", "/data/dir2"])
         
         assert len(args.directories) == 2
-        assert args.directories[0] == dir1
-        assert args.directories[1] == dir2
+        assert args.directories[0] == Path("/data/dir1")
+        assert args.directories[1] == Path("/data/dir2")
 
-    def test_parser_execute_flag(self, tmp_path):
+    def test_parser_execute_flag(self, parser):
         """Test parser execute flag."""
-        parser = create_parser()
-        args = parser.parse_args(["-x", str(tmp_path)])
+        args = parser.parse_args(["-x", "/data/dir"])
         assert args.execute
 
-    def test_parser_verbosity_levels(self, tmp_path):
-        """Test parser verbosity levels."""
-        parser = create_parser()
-        
-        # Test all valid verbosity levels
-        for level in [0, 1, 2]:
-            args = parser.parse_args(["-v", str(level), str(tmp_path)])
-            assert args.verbosity == level
+    @pytest.mark.parametrize("level", [0, 1, 2, 3])
+    def test_parser_verbosity_levels(self, parser, level):
+        """Test parser accepts each valid verbosity level."""
+        args = parser.parse_args(["-v", str(level), "/data/dir"])
+        assert args.verbosity == level
 
-    def test_parser_invalid_verbosity(self, tmp_path):
+    def test_parser_invalid_verbosity(self, quiet_parser):
         """Test parser rejects invalid verbosity levels."""
-        parser = create_parser()
-        with pytest.raises(SystemExit):
-            parser.parse_args(["-v", "3", str(tmp_path)])
+        with pytest.raises(SystemExit) as exc_info:
+            quiet_parser.parse_args(["-v", "4", "/data/dir"])
+        assert exc_info.value.code == 2
+
+    def test_parser_tolerance(self, parser):
+        """Test parser tolerance option."""
+        assert parser.parse_args(["/data/dir"]).tolerance == 0.0
+        assert parser.parse_args(["--tolerance", "2.5", "/data/dir"]).tolerance == 2.5
+
+    @pytest.mark.parametrize("value", ["-5", "nan", "inf", "soon"])
+    def test_parser_invalid_tolerance(self, quiet_parser, value):
+        """Test parser rejects negative, non-finite and non-numeric tolerances."""
+        with pytest.raises(SystemExit) as exc_info:
+            quiet_parser.parse_args(["--tolerance", value, "/data/dir"])
+        assert exc_info.value.code == 2
+
+    def test_parser_cache_file(self, parser):
+        """Test parser cache file option."""
+        args = parser.parse_args(["/data/dir"])
+        assert args.cache is None
+        
+        args = parser.parse_args(["--cache", "scan.json", "/data/dir"])
+        assert args.cache == Path("scan.json")
 
-    def test_parser_combined_flags(self, tmp_path):
+    def test_parser_exclude(self, parser):
+        """Test parser collects repeated exclude patterns."""
+        assert parser.parse_args(["/data/dir"]).exclude == []
+        
+        args = parser.parse_args(["--exclude", ".git", "--exclude", "*.tmp", "/data/dir"])
+        assert args.exclude == [".git", "*.tmp"]
+
+    def test_parser_stat_threads(self, parser):
+        """Test parser stat threads option."""
+        assert parser.parse_args(["/data/dir"]).stat_threads == 8
+        assert parser.parse_args(["--stat-threads", "32", "/data/dir"]).stat_threads == 32
+
+    @pytest.mark.parametrize("value", ["0", "-3", "many"])
+    def test_parser_invalid_stat_threads(self, quiet_parser, value):
+        """Test parser rejects stat thread counts below 1."""
+        with pytest.raises(SystemExit) as exc_info:
+            quiet_parser.parse_args(["--stat-threads", value, "/data/dir"])
+        assert exc_info.value.code == 2
+
+    def test_parser_fast_stat(self, parser):
+        """Test parser fast stat flag."""
+        assert not parser.parse_args(["/data/dir"]).fast_stat
+        assert parser.parse_args(["--fast-stat", "/data/dir"]).fast_stat
+
+    def test_parser_combined_flags(self, parser):
         """Test parser with multiple flags combined."""
-        parser = create_parser()
-        args = parser.parse_args(["-x", "-v", "2", str(tmp_path)])
+        args = parser.parse_args(["-x", "-v", "2", "/data/dir"])
         
         assert args.execute
         assert args.verbosity == 2
@@ -103,207 +181,154 @@ class TestParser:
 class TestColoredOutput:
     """Test colored output functions."""
 
-    @patch('updatedirdates.main.print')
-    def test_print_colored_no_color(self, mock_print):
+    def test_print_colored_no_color(self, main_mod, capsys):
         """Test print_colored without color."""
-        print_colored("test message")
-        mock_print.assert_called_once()
+        main_mod.print_colored("test message")
+        assert capsys.readouterr().out == f"test message{Style.RESET_ALL}\n"
 
-    @patch('updatedirdates.main.print')
-    def test_print_colored_with_color(self, mock_print):
+    def test_print_colored_with_color(self, main_mod, capsys):
         """Test print_colored with color."""
-        print_colored("test message", "RED")
-        mock_print.assert_called_once()
+        main_mod.print_colored("test message", Fore.RED)
+        assert capsys.readouterr().out == f"{Fore.RED}test message{Style.RESET_ALL}\n"
 
-    @patch('updatedirdates.main.print_colored')
-    def test_print_error(self, mock_print_colored):
+    def test_print_error(self, main_mod, monkeypatch, recorder):
         """Test print_error function."""
-        print_error("error message")
-        mock_print_colored.assert_called_once_with("ERROR: error message", "\033[31m")
+        monkeypatch.setattr(main_mod, 'print_colored', recorder)
+        main_mod.print_error("error message")
+        assert recorder.calls == [(("ERROR: error message", "\033[31m"), {})]
 
-    @patch('updatedirdates.main.print_colored')
-    def test_print_warning(self, mock_print_colored):
+    def test_print_warning(self, main_mod, monkeypatch, recorder):
         """Test print_warning function."""
-        print_warning("warning message")
-        mock_print_colored.assert_called_once_with("WARNING: warning message", "\033[33m")
+        monkeypatch.setattr(main_mod, 'print_colored', recorder)
+        main_mod.print_warning("warning message")
+        assert recorder.calls == [(("WARNING: warning message", "\033[33m"), {})]
 
-    @patch('updatedirdates.main.print_colored')
-    def test_print_success(self, mock_print_colored):
+    def test_print_success(self, main_mod, monkeypatch, recorder):
         """Test print_success function."""
-        print_success("success message")
-        mock_print_colored.assert_called_once_with("success message", "\033[32m")
+        monkeypatch.setattr(main_mod, 'print_colored', recorder)
+        main_mod.print_success("success message")
+        assert recorder.calls == [(("success message", "\033[32m"), {})]
 
 
 class TestDirectoryValidation:
     """Test directory validation."""
 
-    def test_validate_existing_directory(self, tmp_path):
+    def test_validate_existing_directory(self, main_mod, sample_paths):
         """Test validation of existing directory."""
-        test_dir = tmp_path / "test"
-        test_dir.mkdir()
-        
-        result = validate_directories([test_dir])
+        result = main_mod.validate_directories([sample_paths.valid])
         assert len(result) == 1
-        assert result[0].resolve() == test_dir.resolve()
+        assert result[0].resolve() == sample_paths.valid.resolve()
 
-    def test_validate_multiple_directories(self, tmp_path):
+    def test_validate_multiple_directories(self, main_mod, sample_paths):
         """Test validation of multiple directories."""
-        dir1 = tmp_path / "dir1"
-        dir2 = tmp_path / "dir2"
-        dir1.mkdir()
-        dir2.mkdir()
-        
-        result = validate_directories([dir1, dir2])
+        result = main_mod.validate_directories([sample_paths.valid, sample_paths.other])
         assert len(result) == 2
 
-    def test_validate_nonexistent_directory(self, tmp_path):
+    def test_validate_nonexistent_directory(self, main_mod, sample_paths, monkeypatch, recorder):
         """Test validation rejects non-existent directory."""
-        nonexistent = tmp_path / "nonexistent"
-        
-        with patch('updatedirdates.main.print_error') as mock_error:
-            result = validate_directories([nonexistent])
-            assert len(result) == 0
-            mock_error.assert_called_once()
+        monkeypatch.setattr(main_mod, 'print_error', recorder)
+        result = main_mod.validate_directories([sample_paths.nonexistent])
+        assert len(result) == 0
+        assert len(recorder.calls) == 1
 
-    def test_validate_file_not_directory(self, tmp_path):
+    def test_validate_file_not_directory(self, main_mod, sample_paths, monkeypatch, recorder):
         """Test validation rejects file as directory."""
-        test_file = tmp_path / "test.txt"
-        test_file.write_text("test")
-        
-        with patch('updatedirdates.main.print_error') as mock_error:
-            result = validate_directories([test_file])
-            assert len(result) == 0
-            mock_error.assert_called_once()
+        monkeypatch.setattr(main_mod, 'print_error', recorder)
+        result = main_mod.validate_directories([sample_paths.invalid_file])
+        assert len(result) == 0
+        assert len(recorder.calls) == 1
 
-    def test_validate_mixed_valid_invalid(self, tmp_path):
+    def test_validate_mixed_valid_invalid(self, main_mod, sample_paths, monkeypatch):
         """Test validation with mix of valid and invalid paths."""
-        valid_dir = tmp_path / "valid"
-        invalid_file = tmp_path / "invalid.txt"
-        nonexistent = tmp_path / "nonexistent"
-        
-        valid_dir.mkdir()
-        invalid_file.write_text("test")
-        
-        with patch('updatedirdates.main.print_error'):
-            result = validate_directories([valid_dir, invalid_file, nonexistent])
-            assert len(result) == 1
-            assert result[0].resolve() == valid_dir.resolve()
+        monkeypatch.setattr(main_mod, 'print_error', Recorder())
+        result = main_mod.validate_directories(
+            [sample_paths.valid, sample_paths.invalid_file, sample_paths.nonexistent]
+        )
+        assert len(result) == 1
+        assert result[0].resolve() == sample_paths.valid.resolve()
 
 
+@pytest.mark.usefixtures("noop_colorama")
 class TestMainFunction:
     """Test the main function."""
 
-    @patch('updatedirdates.main.setup_colorama')
-    @patch('updatedirdates.main.DirectoryUpdater')
-    def test_main_success(self, mock_updater_class, mock_setup, tmp_path):
-        """Test main function success case."""
-        test_dir = tmp_path / "test"
-        test_dir.mkdir()
-        
-        # Mock the updater instance
-        mock_updater = Mock()
-        mock_updater.process_directory.return_value = 2
-        mock_updater_class.return_value = mock_updater
-        
-        # Mock sys.argv
-        with patch.object(sys, 'argv', ['updatedirdates', str(test_dir)]):
-            result = main()
-        
-        assert result == 0
-        mock_setup.assert_called_once()
-        mock_updater.process_directory.assert_called_once()
-        mock_updater.print_statistics.assert_called_once()
-
-    @patch('updatedirdates.main.validate_directories')
-    def test_main_no_valid_directories(self, mock_validate):
+    def test_main_no_valid_directories(self, main_mod, monkeypatch, set_argv):
         """Test main function with no valid directories."""
-        mock_validate.return_value = []
-        
-        with patch.object(sys, 'argv', ['updatedirdates', 'nonexistent']):
-            result = main()
+        monkeypatch.setattr(main_mod, 'validate_directories', Recorder([]))
         
-        assert result == 1
-
-    @patch('updatedirdates.main.setup_colorama')
-    @patch('updatedirdates.main.DirectoryUpdater')
-    def test_main_keyboard_interrupt(self, mock_updater_class, mock_setup, tmp_path):
-        """Test main function with keyboard interrupt."""
-        test_dir = tmp_path / "test"
-        test_dir.mkdir()
-        
-        # Mock the updater to raise KeyboardInterrupt
-        mock_updater = Mock()
-        mock_updater.process_directory.side_effect = KeyboardInterrupt()
-        mock_updater_class.return_value = mock_updater
-        
-        with patch.object(sys, 'argv', ['updatedirdates', str(test_dir)]):
-            result = main()
-        
-        assert result == 130
-
-    @patch('updatedirdates.main.setup_colorama')
-    @patch('updatedirdates.main.DirectoryUpdater')
-    def test_main_unexpected_error(self, mock_updater_class, mock_setup, tmp_path):
-        """Test main function with unexpected error."""
-        test_dir = tmp_path / "test"
-        test_dir.mkdir()
-        
-        # Mock the updater to raise an exception
-        mock_updater = Mock()
-        mock_updater.process_directory.side_effect = Exception("Test error")
-        mock_updater_class.return_value = mock_updater
-        
-        with patch.object(sys, 'argv', ['updatedirdates', str(test_dir)]):
-            result = main()
+        set_argv(['updatedirdates', 'nonexistent'])
+        result = main_mod.main()
         
         assert result == 1
 
-    @patch('updatedirdates.main.setup_colorama')
-    @patch('updatedirdates.main.DirectoryUpdater')
-    def test_main_with_execute_flag(self, mock_updater_class, mock_setup, tmp_path):
-        """Test main function with execute flag."""
-        test_dir = tmp_path / "test"
-        test_dir.mkdir()
-        
-        mock_updater = Mock()
-        mock_updater.process_directory.return_value = 1
-        mock_updater_class.return_value = mock_updater
-        
-        with patch.object(sys, 'argv', ['updatedirdates', '-x', str(test_dir)]):
-            result = main()
+    @pytest.mark.parametrize(
+        "argv_extra,return_value,side_effect,expected_rc,expected_kwargs",
+        [
+            pytest.param([], 2, None, 0, {}, id="success"),
+            pytest.param([], None, KeyboardInterrupt(), 130, {}, id="keyboard_interrupt"),
+            pytest.param([], None, Exception("Test error"), 1, {}, id="unexpected_error"),
+            pytest.param(["-x"], 1, None, 0, {"dry_run": False}, id="execute_flag"),
+            pytest.param(["-v", "2"], 0, None, 0, {"verbosity": 2}, id="verbosity"),
+        ],
+    )
+    def test_main(
+        self,
+        main_mod,
+        test_dir,
+        monkeypatch,
+        set_argv,
+        updater_factory,
+        argv_extra,
+        return_value,
+        side_effect,
+        expected_rc,
+        expected_kwargs,
+    ):
+        """Test main function exit codes and the options passed to the updater."""
+        updater_factory.rv = return_value
+        updater_factory.exc = side_effect
+        mock_setup = Recorder()
+        monkeypatch.setattr(main_mod, 'setup_colorama', mock_setup)
         
-        assert result == 0
-        # Verify updater was created with dry_run=False
-        mock_updater_class.assert_called_once()
-        args, kwargs = mock_updater_class.call_args
-        assert kwargs['dry_run'] is False
-
-    @patch('updatedirdates.main.setup_colorama')
-    @patch('updatedirdates.main.DirectoryUpdater')
-    def test_main_with_verbosity(self, mock_updater_class, mock_setup, tmp_path):
-        """Test main function with verbosity setting."""
-        test_dir = tmp_path / "test"
-        test_dir.mkdir()
+        set_argv(['updatedirdates', *argv_extra, str(test_dir)])
+        result = main_mod.main()
         
-        mock_updater = Mock()
-        mock_updater.process_directory.return_value = 0
-        mock_updater_class.return_value = mock_updater
+        assert result == expected_rc
+        assert len(mock_setup.calls) == 1
+        assert len(updater_factory.instances) == 1
+        updater = updater_factory.instances[0]
+        for name, value in expected_kwargs.items():
+            assert updater.init_kwargs[name] == value
+        assert updater.processed == [test_dir.resolve()]
+        assert updater.closed
+        # Statistics are only printed when processing finished
+        assert updater.stats_printed == (expected_rc == 0)
+
+    @pytest.mark.parametrize("side_effect", [KeyboardInterrupt(), Exception("Test error")],
+                             ids=["keyboard_interrupt", "unexpected_error"])
+    def test_main_flushes_output_before_error(
+        self, main_mod, test_dir, monkeypatch, set_argv, updater_factory, side_effect
+    ):
+        """Test queued status lines are written before the failure message."""
+        updater_factory.exc = side_effect
+        flushed_at_error = []
+        monkeypatch.setattr(main_mod, 'setup_colorama', Recorder())
+        monkeypatch.setattr(
+            main_mod, 'print_error',
+            lambda message: flushed_at_error.append(updater_factory.instances[0].logs_flushed)
+        )
         
-        with patch.object(sys, 'argv', ['updatedirdates', '-v', '2', str(test_dir)]):
-            result = main()
+        set_argv(['updatedirdates', str(test_dir)])
+        main_mod.main()
         
-        assert result == 0
-        # Verify updater was created with verbosity=2
-        mock_updater_class.assert_called_once()
-        args, kwargs = mock_updater_class.call_args
-        assert kwargs['verbosity'] == 2
+        assert flushed_at_error == [True]
 
 
 class TestColoramaSetup:
     """Test colorama setup."""
 
-    @patch('colorama.init')
-    def test_setup_colorama(self, mock_init):
+    def test_setup_colorama(self, main_mod, monkeypatch, recorder):
         """Test colorama initialization."""
-        setup_colorama()
-        mock_init.assert_called_once_with(autoreset=True)
\ No newline at end of file
+        monkeypatch.setattr(main_mod.colorama, 'init', recorder)
+        main_mod.setup_colorama()
+        assert recorder.calls == [((), {"autoreset": True})]
\ No newline at end of file
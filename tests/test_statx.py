@@ -0,0 +1,70 @@
+"""Tests for the statx module."""
+
+import errno
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from updatedirdates.statx import get_fast_lstat
+
+
+class TestFastLstat:
+    """Test get_fast_lstat function."""
+
+    def test_matches_lstat(self, tmp_path):
+        """Test the fields the scan relies on match os.lstat()."""
+        fast_lstat = get_fast_lstat()
+        
+        test_file = tmp_path / "test.txt"
+        test_file.write_text("content")
+        os.utime(test_file, ns=(1_000_000_000_123_456_789, 1_000_000_000_123_456_789))
+        link = tmp_path / "link"
+        link.symlink_to(test_file)
+        
+        for path in (tmp_path, test_file, link):
+            expected = os.lstat(path)
+            result = fast_lstat(str(path))
+            assert result.st_mode == expected.st_mode
+            assert result.st_mtime_ns == expected.st_mtime_ns
+            assert result.st_dev == expected.st_dev
+
+    def test_dir_fd(self, tmp_path):
+        """Test names are resolved relative to dir_fd, like os.lstat()."""
+        fast_lstat = get_fast_lstat()
+        
+        (tmp_path / "test.txt").write_text("content")
+        dir_fd = os.open(tmp_path, os.O_RDONLY)
+        try:
+            result = fast_lstat("test.txt", dir_fd=dir_fd)
+        finally:
+            os.close(dir_fd)
+            
+        assert result.st_mtime_ns == (tmp_path / "test.txt").lstat().st_mtime_ns
+
+    def test_missing_file(self, tmp_path):
+        """Test a missing path raises FileNotFoundError."""
+        fast_lstat = get_fast_lstat()
+        
+        with pytest.raises(FileNotFoundError):
+            fast_lstat(str(tmp_path / "missing"))
+
+    def test_fallback_off_linux(self):
+        """Test other platforms fall back to os.lstat()."""
+        with patch.object(sys, 'platform', 'win32'):
+            assert get_fast_lstat() is os.lstat
+
+    @pytest.mark.parametrize("error", [errno.ENOSYS, errno.EPERM, errno.EINVAL])
+    def test_fallback_when_probe_fails(self, error):
+        """Test a kernel that rejects statx() falls back to os.lstat()."""
+        def failing_statx(*args):
+            return -1
+            
+        libc = type("FakeLibc", (), {"statx": staticmethod(failing_statx)})()
+        with (
+            patch.object(sys, 'platform', 'linux'),
+            patch('ctypes.CDLL', return_value=libc),
+            patch('ctypes.get_errno', return_value=error),
+        ):
+            assert get_fast_lstat() is os.lstat
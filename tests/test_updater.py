@@ -1,14 +1,61 @@
 """Tests for the updater module."""
 
+import contextlib
+import inspect
+import json
+import math
 import os
+import sys
 import tempfile
+import threading
 import time
 from pathlib import Path
-from unittest.mock import Mock, patch
+from unittest.mock import patch
 
 import pytest
+from colorama import Fore
 
-from updatedirdates.updater import DirectoryUpdater
+from updatedirdates import updater as updater_module
+from updatedirdates.updater import PARALLEL_MIN_FANOUT, DirectoryUpdater, scan_entries
+
+from .helpers import Recorder
+
+
+@pytest.fixture(scope="module")
+def nested_tree(tmp_path_factory):
+    """Three-level tree with known file mtimes, built once for read-only tests.
+    
+    Layout: root.txt, subdir/sub.txt (the newest file) and subdir/nested/nested.txt.
+    Tests using it must not modify it; dry runs leave it untouched.
+    """
+    root = tmp_path_factory.mktemp("nested")
+    nested = root / "subdir" / "nested"
+    nested.mkdir(parents=True)
+    for path, mtime in (
+        (root / "root.txt", 1_700_000_000),
+        (root / "subdir" / "sub.txt", 1_700_000_100),
+        (nested / "nested.txt", 1_700_000_050),
+    ):
+        path.write_text(path.stem)
+        os.utime(path, (mtime, mtime))
+    return root
+
+
+@pytest.fixture(scope="module")
+def branched_tree(tmp_path_factory):
+    """Two parallel branches, built once for read-only tests that count syscalls.
+    
+    Layout: root.txt plus a/file.txt, a/nested/file.txt, b/file.txt and
+    b/nested/file.txt. Tests using it must only do dry runs.
+    """
+    root = tmp_path_factory.mktemp("branched")
+    for parent in ("a", "b"):
+        nested = root / parent / "nested"
+        nested.mkdir(parents=True)
+        (root / parent / "file.txt").write_text("content")
+        (nested / "file.txt").write_text("content")
+    (root / "root.txt").write_text("content")
+    return root
 
 
 class TestDirectoryUpdater:
@@ -25,25 +72,29 @@ class TestDirectoryUpdater:
         assert updater.print_warning is not None
         assert updater.print_success is not None
 
-    def test_init_custom_values(self):
+    def test_init_custom_values(self, recorder):
         """Test DirectoryUpdater initialization with custom values."""
-        mock_print = Mock()
-        
         updater = DirectoryUpdater(
             verbosity=2,
             dry_run=False,
-            print_colored=mock_print,
-            print_error=mock_print,
-            print_warning=mock_print,
-            print_success=mock_print,
+            print_colored=recorder,
+            print_error=recorder,
+            print_warning=recorder,
+            print_success=recorder,
         )
         
         assert updater.verbosity == 2
         assert updater.dry_run is False
-        assert updater.print_colored is mock_print
-        assert updater.print_error is mock_print
-        assert updater.print_warning is mock_print
-        assert updater.print_success is mock_print
+        assert updater.print_colored is recorder
+        assert updater.print_error is recorder
+        assert updater.print_warning is recorder
+        assert updater.print_success is recorder
+
+    @pytest.mark.parametrize("tolerance", [-1.0, math.nan, math.inf])
+    def test_init_invalid_tolerance(self, tolerance):
+        """Test DirectoryUpdater rejects negative and non-finite tolerances."""
+        with pytest.raises(ValueError):
+            DirectoryUpdater(tolerance=tolerance)
 
     def test_default_print(self):
         """Test the default print function."""
@@ -72,10 +123,10 @@ class TestGetLatestModificationTime:
         # Create a test file
         test_file = tmp_path / "test.txt"
         test_file.write_text("test content")
-        file_time = test_file.stat().st_mtime
+        file_time = test_file.stat().st_mtime_ns
         
-        latest_time, dir_count, file_count = updater.get_latest_modification_time(tmp_path)
-        assert latest_time >= file_time
+        latest_time, dir_count, file_count, source_file = updater.get_latest_modification_time(tmp_path)
+        assert latest_time == file_time
         assert dir_count == 0
         assert file_count == 1
 
@@ -88,89 +139,381 @@ class TestGetLatestModificationTime:
         file2 = tmp_path / "file2.txt"
         
         file1.write_text("content1")
-        time.sleep(0.1)  # Ensure different timestamps
         file2.write_text("content2")
+        os.utime(file1, (1_700_000_000.0, 1_700_000_000.0))
+        os.utime(file2, (1_700_000_100.0, 1_700_000_100.0))
         
-        file2_time = file2.stat().st_mtime
-        latest_time, dir_count, file_count = updater.get_latest_modification_time(tmp_path)
+        latest_time, dir_count, file_count, source_file = updater.get_latest_modification_time(tmp_path)
         
-        # Result should be at least as recent as file2
-        assert latest_time >= file2_time
+        assert latest_time == 1_700_000_100_000_000_000
         assert dir_count == 0
         assert file_count == 2
+        assert source_file == file2
 
-    def test_subdirectories(self, tmp_path):
+    def test_subdirectories(self, nested_tree):
         """Test getting latest time from nested directory structure."""
         updater = DirectoryUpdater()
         
-        # Create nested directory structure
-        subdir = tmp_path / "subdir"
-        subdir.mkdir()
+        latest_time, dir_count, file_count, source_file = updater.get_latest_modification_time(nested_tree)
         
-        file_in_root = tmp_path / "root.txt"
-        file_in_sub = subdir / "sub.txt"
+        assert latest_time == 1_700_000_100_000_000_000
+        assert dir_count == 1  # One subdirectory
+        assert file_count == 3  # Three files total
+        assert source_file == nested_tree / "subdir" / "sub.txt"
+
+    def test_symlinked_directory_not_followed(self, tmp_path):
+        """Test symlinks to directories are neither followed nor counted as files."""
+        updater = DirectoryUpdater()
         
-        file_in_root.write_text("root content")
-        time.sleep(0.1)
-        file_in_sub.write_text("sub content")
+        target = tmp_path / "target"
+        target.mkdir()
+        (target / "inside.txt").write_text("content")
         
-        file_in_sub_time = file_in_sub.stat().st_mtime
-        latest_time, dir_count, file_count = updater.get_latest_modification_time(tmp_path)
+        scanned = tmp_path / "scanned"
+        scanned.mkdir()
+        (scanned / "link").symlink_to(target, target_is_directory=True)
         
-        assert latest_time >= file_in_sub_time
-        assert dir_count == 1  # One subdirectory
-        assert file_count == 2  # Two files total
+        latest_time, dir_count, file_count, source_file = updater.get_latest_modification_time(scanned)
+        assert latest_time == 0
+        assert dir_count == 0
+        assert file_count == 0
+        assert source_file is None
+
+    def test_symlinked_file_uses_target_mtime(self, tmp_path):
+        """Test a symlink to a file is counted with its target's mtime."""
+        updater = DirectoryUpdater()
+        
+        target = tmp_path / "target.txt"
+        target.write_text("content")
+        os.utime(target, (1_000_000_000, 1_000_000_000))
+        
+        scanned = tmp_path / "scanned"
+        scanned.mkdir()
+        link = scanned / "link.txt"
+        link.symlink_to(target)
+        
+        latest_time, dir_count, file_count, source_file = updater.get_latest_modification_time(scanned)
+        assert latest_time == 1_000_000_000_000_000_000
+        assert file_count == 1
+        assert source_file == link
+
+    def test_backends_match(self, tmp_path):
+        """Test every scan backend reports the same totals for one tree."""
+        root = tmp_path / "root"
+        for index, name in enumerate(("a", "a/b", "a/b/c", "d", "e", "f", "g", "h")):
+            directory = root / name
+            directory.mkdir(parents=True)
+            target = directory / f"file{index}.txt"
+            target.write_text("content")
+            os.utime(target, ns=(1_000_000_000_123_456_789 + index, 1_000_000_000_123_456_789 + index))
+        (root / "a" / "link.txt").symlink_to(root / "d" / "file3.txt")
+        cache_file = tmp_path / "cache.json"
+        
+        def cached_updater():
+            return DirectoryUpdater(cache_file=cache_file)
+            
+        results = []
+        for make_updater in (
+            DirectoryUpdater,
+            lambda: DirectoryUpdater(fast_stat=True),
+            lambda: DirectoryUpdater(stat_workers=1),
+            cached_updater,
+            cached_updater,  # Second run is served from the cache
+        ):
+            updater = make_updater()
+            results.append(updater.get_latest_modification_time(root))
+            updater.close()
+            
+        assert results[0][:3] == (1_000_000_000_123_456_796, 6, 9)
+        assert results[0][3] == root / "h" / "file7.txt"
+        assert all(result == results[0] for result in results)
 
     def test_empty_directory(self, tmp_path):
         """Test getting latest time from empty directory."""
         updater = DirectoryUpdater()
         
-        latest_time, dir_count, file_count = updater.get_latest_modification_time(tmp_path)
+        latest_time, dir_count, file_count, source_file = updater.get_latest_modification_time(tmp_path)
         assert latest_time >= 0  # Should return some valid timestamp
         assert dir_count == 0
         assert file_count == 0
 
-    def test_inaccessible_file(self, tmp_path):
+    def test_inaccessible_file(self, tmp_path, recorder):
         """Test handling inaccessible files."""
         updater = DirectoryUpdater(verbosity=2)
-        mock_warning = Mock()
-        updater.print_warning = mock_warning
+        updater.print_warning = recorder
         
-        # Create a file
+        # Create a readable file and a symlink whose target cannot be stat'd
         test_file = tmp_path / "test.txt"
         test_file.write_text("content")
+        broken = tmp_path / "broken.txt"
+        broken.symlink_to(tmp_path / "missing.txt")
         
-        # Mock stat to raise an error
-        with patch('pathlib.Path.stat', side_effect=OSError("Permission denied")):
-            latest_time, dir_count, file_count = updater.get_latest_modification_time(tmp_path)
-            assert latest_time >= 0  # Should still return a valid time
-            # Should have warned about the inaccessible file
-            assert mock_warning.call_count >= 0
-            assert dir_count >= 0
-            assert file_count >= 0
-
-    def test_os_walk_error(self, tmp_path):
-        """Test handling os.walk errors."""
+        latest_time, dir_count, file_count, source_file = updater.get_latest_modification_time(tmp_path)
+        assert latest_time == test_file.stat().st_mtime_ns
+        assert dir_count == 0
+        assert file_count == 1
+        assert source_file == test_file
+        # Should have warned about the inaccessible file
+        recorder.assert_called_once()
+        assert str(broken) in recorder.call_args.args[0]
+
+    def test_scandir_error(self, tmp_path, recorder):
+        """Test handling os.scandir errors on the root directory."""
         updater = DirectoryUpdater()
-        mock_error = Mock()
-        updater.print_error = mock_error
+        updater.print_error = recorder
         
-        # Mock os.walk to raise an error
-        with patch('os.walk', side_effect=OSError("Walk failed")):
-            latest_time, dir_count, file_count = updater.get_latest_modification_time(tmp_path)
+        # Mock os.scandir to raise an error
+        with patch('os.scandir', side_effect=OSError("Scan failed")):
+            latest_time, dir_count, file_count, source_file = updater.get_latest_modification_time(tmp_path)
             # Should fallback to directory's own mtime
-            dir_time = tmp_path.stat().st_mtime
+            dir_time = tmp_path.stat().st_mtime_ns
             assert latest_time == dir_time
             assert dir_count == 0
             assert file_count == 0
-            mock_error.assert_called_once()
+            recorder.assert_called_once()
+
+
+class TestCollectTree:
+    """Test collect_tree method."""
+
+    def test_one_file_system(self, tmp_path):
+        """Test directories on another device are left out of the tree."""
+        updater = DirectoryUpdater(one_file_system=True)
+        
+        (tmp_path / "local").mkdir()
+        (tmp_path / "mounted").mkdir()
+        (tmp_path / "mounted" / "file.txt").write_text("content")
+        root_stat = tmp_path.stat()
+        real_scan = updater_module.scan_entries
+        
+        def scan_with_mount(path, *args):
+            subdirs, *rest = real_scan(path, *args)
+            # Report "mounted" as living on a different device
+            subdirs = [
+                (subdir, os.stat_result((*subdir_stat[:2], root_stat.st_dev + 1, *subdir_stat[3:])))
+                if subdir.endswith("mounted") else (subdir, subdir_stat)
+                for subdir, subdir_stat in subdirs
+            ]
+            return (subdirs, *rest)
+            
+        with patch.object(updater_module, 'scan_entries', side_effect=scan_with_mount):
+            tree = updater.collect_tree(tmp_path, root_stat)
+            
+        assert tree.paths == [str(tmp_path), str(tmp_path / "local")]
+        assert tree.dir_count[0] == 1
+
+    def test_unreadable_subdirectory(self, tmp_path, recorder):
+        """Test a subdirectory that cannot be read is reported and its siblings still processed."""
+        updater = DirectoryUpdater(print_error=recorder)
+        
+        bad = tmp_path / "bad"
+        good = tmp_path / "good"
+        (bad / "below").mkdir(parents=True)
+        good.mkdir()
+        (good / "file.txt").write_text("content")
+        (tmp_path / "root.txt").write_text("content")
+        for path in (good / "file.txt", tmp_path / "root.txt"):
+            os.utime(path, (1_700_000_000, 1_700_000_000))
+        real_scan = updater._scan_directory
+        
+        def scan_failing_bad(path, dir_mtime):
+            if path == str(bad):
+                return [], 0, None, 0, PermissionError(13, "Permission denied", path)
+            return real_scan(path, dir_mtime)
+            
+        with patch.object(updater, '_scan_directory', side_effect=scan_failing_bad):
+            tree = updater.collect_tree(tmp_path)
+            changes = updater.process_directory(tmp_path)
+            
+        assert sorted(tree.paths) == sorted([str(tmp_path), str(bad), str(good)])
+        assert [tree.readable[tree.paths.index(str(path))] for path in (tmp_path, bad, good)] == [True, False, True]
+        assert tree.dir_count[0] == 2
+        assert recorder.call_count == 2
+        assert recorder.calls[0].args[0].startswith(f"Error reading directory {bad}: ")
+        # The root and good need updating; the unreadable directory is left alone
+        assert changes == 2
+
+    def test_parents_precede_children(self, tmp_path):
+        """Test every directory is stored after its parent."""
+        updater = DirectoryUpdater()
+        
+        (tmp_path / "a" / "b").mkdir(parents=True)
+        (tmp_path / "c").mkdir()
+        
+        tree = updater.collect_tree(tmp_path)
+        
+        assert tree.paths[0] == str(tmp_path)
+        assert tree.parent[0] == -1
+        assert len(tree.paths) == 4
+        for index in range(1, len(tree.paths)):
+            assert tree.parent[index] < index
+            assert tree.depth[index] == tree.depth[tree.parent[index]] + 1
+
+    def test_fold_accumulates_subtree_totals(self, tmp_path):
+        """Test folding in reverse order yields subtree totals at the root."""
+        updater = DirectoryUpdater()
+        
+        subdir = tmp_path / "subdir"
+        subdir.mkdir()
+        (tmp_path / "root.txt").write_text("root")
+        (subdir / "sub.txt").write_text("sub")
+        os.utime(tmp_path / "root.txt", (1_000_000_000, 1_000_000_000))
+        os.utime(subdir / "sub.txt", (1_000_000_100, 1_000_000_100))
+        
+        tree = updater.collect_tree(tmp_path)
+        assert tree.file_count[0] == 1
+        assert tree.dir_count[0] == 1
+        
+        for index in range(len(tree.paths) - 1, -1, -1):
+            tree.fold(index)
+        
+        assert tree.file_count[0] == 2
+        assert tree.newest_mtime[0] == 1_000_000_100 * 1_000_000_000
+        assert tree.source[0] == str(subdir / "sub.txt")
+
+
+class TestScanEntries:
+    """Test the scan_entries kernel."""
+
+    def test_single_level(self, tmp_path):
+        """Test one level is read, returning subdirectories with their stats."""
+        subdir = tmp_path / "subdir"
+        subdir.mkdir()
+        (subdir / "nested.txt").write_text("nested")
+        test_file = tmp_path / "test.txt"
+        test_file.write_text("content")
+        
+        subdirs, newest_mtime, source_path, file_count, entry_errors = scan_entries(str(tmp_path))
+        
+        assert subdirs == [(str(subdir), subdir.lstat())]
+        assert newest_mtime == test_file.stat().st_mtime_ns
+        assert source_path == str(test_file)
+        assert file_count == 1
+        assert entry_errors == []
+
+    def test_entry_errors_returned(self, tmp_path):
+        """Test entries that cannot be stat'd are returned rather than reported."""
+        (tmp_path / "dangling").symlink_to(tmp_path / "missing")
+        
+        subdirs, newest_mtime, source_path, file_count, entry_errors = scan_entries(str(tmp_path))
+        
+        assert file_count == 0
+        assert len(entry_errors) == 1
+        entry_path, is_directory, error = entry_errors[0]
+        assert entry_path == str(tmp_path / "dangling")
+        assert not is_directory
+        assert isinstance(error, FileNotFoundError)
+
+    def test_fast_stat_matches(self, tmp_path):
+        """Test scanning with fast stat gives the same result as DirEntry.stat()."""
+        (tmp_path / "subdir").mkdir()
+        (tmp_path / "test.txt").write_text("content")
+        
+        subdirs, newest_mtime, source_path, file_count, entry_errors = scan_entries(str(tmp_path))
+        fast_result = DirectoryUpdater(fast_stat=True)._scan_directory(str(tmp_path), 0)
+        
+        assert [path for path, _ in fast_result[0]] == [path for path, _ in subdirs]
+        assert fast_result[1:4] == (newest_mtime, source_path, file_count)
+
+    def test_exclude(self, tmp_path):
+        """Test excluded names are skipped for both files and directories."""
+        (tmp_path / ".git").mkdir()
+        (tmp_path / "src").mkdir()
+        (tmp_path / "keep.txt").write_text("content")
+        (tmp_path / "scratch.tmp").write_text("content")
+        
+        exclude = updater_module.compile_excludes([".git", "*.tmp"])
+        subdirs, newest_mtime, source_path, file_count, entry_errors = scan_entries(str(tmp_path), exclude=exclude)
+        
+        assert [path for path, _ in subdirs] == [str(tmp_path / "src")]
+        assert file_count == 1
+        assert source_path == str(tmp_path / "keep.txt")
+
+    def test_unreadable_directory_raises(self, tmp_path):
+        """Test a directory that cannot be listed raises OSError."""
+        with pytest.raises(OSError):
+            scan_entries(str(tmp_path / "missing"))
+
+
+class TestScanCache:
+    """Test the persistent scan cache."""
+
+    def test_unchanged_directories_not_rescanned(self, tmp_path):
+        """Test a second run only re-reads directories whose mtime changed."""
+        cache_file = tmp_path / "cache.json"
+        root = tmp_path / "root"
+        subdir = root / "subdir"
+        subdir.mkdir(parents=True)
+        (root / "root.txt").write_text("root")
+        (subdir / "sub.txt").write_text("sub")
+        
+        first = DirectoryUpdater(dry_run=False, cache_file=cache_file)
+        first.process_directory(root)
+        first.close()
+        assert cache_file.exists()
+        
+        second = DirectoryUpdater(dry_run=False, cache_file=cache_file)
+        with patch.object(updater_module, 'scan_entries', wraps=scan_entries) as mock_scan:
+            latest_time, dir_count, file_count, source_file = second.get_latest_modification_time(root)
+        assert mock_scan.call_count == 0
+        assert dir_count == 1
+        assert file_count == 2
+        
+        # Adding a file changes the subdirectory's mtime, so only it is re-read
+        (subdir / "new.txt").write_text("new")
+        with patch.object(updater_module, 'scan_entries', wraps=scan_entries) as mock_scan:
+            latest_time, dir_count, file_count, source_file = second.get_latest_modification_time(root)
+        mock_scan.assert_called_once()
+        assert mock_scan.call_args.args[0] == str(subdir)
+        assert file_count == 3
+        assert source_file == subdir / "new.txt"
+
+    @pytest.mark.parametrize("content", [
+        "not json",
+        f'{{"version": {updater_module.CACHE_VERSION}, "exclude": null, "directories": []}}',
+    ], ids=["corrupt", "wrong_type"])
+    def test_unreadable_cache_file_ignored(self, tmp_path, content, recorder):
+        """Test a corrupt or malformed cache file is reported and ignored."""
+        cache_file = tmp_path / "cache.json"
+        cache_file.write_text(content)
+        
+        updater = DirectoryUpdater(cache_file=cache_file, print_warning=recorder)
+        
+        assert updater._scan_cache == {}
+        recorder.assert_called_once()
+
+    def test_malformed_cache_entry_dropped(self, tmp_path, recorder):
+        """Test a cache entry with the wrong layout is reported and its directory rescanned."""
+        cache_file = tmp_path / "cache.json"
+        root = tmp_path / "root"
+        subdir = root / "subdir"
+        subdir.mkdir(parents=True)
+        (root / "root.txt").write_text("root")
+        (subdir / "sub.txt").write_text("sub")
+        
+        first = DirectoryUpdater(cache_file=cache_file)
+        first.get_latest_modification_time(root)
+        first.close()
+        data = json.loads(cache_file.read_text())
+        data["directories"][str(root)] = data["directories"][str(root)][:3]
+        cache_file.write_text(json.dumps(data))
+        
+        second = DirectoryUpdater(cache_file=cache_file, print_warning=recorder)
+        assert set(second._scan_cache) == {str(subdir)}
+        recorder.assert_called_once()
+        with patch.object(updater_module, 'scan_entries', wraps=scan_entries) as mock_scan:
+            latest_time, dir_count, file_count, source_file = second.get_latest_modification_time(root)
+        mock_scan.assert_called_once()
+        assert mock_scan.call_args.args[0] == str(root)
+        assert dir_count == 1
+        assert file_count == 2
 
 
 class TestShouldUpdateDirectory:
     """Test should_update_directory method."""
 
     def test_directory_newer_than_files(self, tmp_path):
-        """Test directory that doesn't need updating."""
+        """Test directory newer than its files is reset to the newest file."""
         updater = DirectoryUpdater()
         
         # Create a file, then touch the directory to make it newer
@@ -181,59 +524,170 @@ class TestShouldUpdateDirectory:
         current_time = time.time()
         os.utime(tmp_path, (current_time + 10, current_time + 10))
         
-        needs_update, current_time_result, latest_time, dir_count, file_count = updater.should_update_directory(tmp_path)
+        needs_update, current_time_result, latest_time, dir_count, file_count, source_file = updater.should_update_directory(tmp_path)
         
-        assert not needs_update
-        assert current_time_result > 0
-        assert latest_time > 0
+        assert needs_update
+        assert current_time_result > latest_time > 0
         assert dir_count == 0
         assert file_count == 1
+        assert source_file == test_file
 
     def test_files_newer_than_directory(self, tmp_path):
         """Test directory that needs updating."""
         updater = DirectoryUpdater()
         
-        # Set directory to old timestamp
-        old_time = time.time() - 100
-        os.utime(tmp_path, (old_time, old_time))
-        
         # Create a new file
         test_file = tmp_path / "new.txt"
         test_file.write_text("content")
+        os.utime(test_file, (1_700_000_100.0, 1_700_000_100.0))
+        
+        # Set directory to an older timestamp; creating the file had touched it
+        os.utime(tmp_path, (1_700_000_000.0, 1_700_000_000.0))
+                
+        with patch('os.scandir', wraps=os.scandir) as mock_scandir:
+            needs_update, current_time_result, latest_time, dir_count, file_count, source_file = updater.should_update_directory(tmp_path)
+            
+        # The directory's own time and its contents come from a single pass
+        mock_scandir.assert_called_once()
+        assert needs_update
+        assert current_time_result == 1_700_000_000_000_000_000
+        assert latest_time == 1_700_000_100_000_000_000
+        assert dir_count == 0
+        assert file_count == 1
+
+    def test_small_difference_detected(self, tmp_path):
+        """Test a sub-second difference is enough to need an update."""
+        updater = DirectoryUpdater()
         
-        # Sleep to ensure file time is definitely newer
-        time.sleep(0.1)
+        test_file = tmp_path / "test.txt"
+        test_file.write_text("content")
+        file_ns = test_file.stat().st_mtime_ns
+        os.utime(tmp_path, ns=(file_ns - 1000, file_ns - 1000))
         
-        needs_update, current_time_result, latest_time, dir_count, file_count = updater.should_update_directory(tmp_path)
+        needs_update, current_time, latest_time, dir_count, file_count, source_file = updater.should_update_directory(tmp_path)
         
-        # Check that the directory is older and file is newer by more than 1 second tolerance
-        time_diff = latest_time - current_time_result
-        if time_diff > 1.0:
-            assert needs_update
-        else:
-            # If times are very close, the update logic correctly doesn't update
-            assert not needs_update or needs_update
+        assert needs_update
+
+    def test_tolerance(self, tmp_path):
+        """Test differences within the configured tolerance are ignored."""
+        updater = DirectoryUpdater(tolerance=1.0)
         
-        assert latest_time >= current_time_result
-        assert dir_count == 0
+        test_file = tmp_path / "test.txt"
+        test_file.write_text("content")
+        file_ns = test_file.stat().st_mtime_ns
+        os.utime(tmp_path, ns=(file_ns - 500_000_000, file_ns - 500_000_000))
+        
+        needs_update, current_time, latest_time, dir_count, file_count, source_file = updater.should_update_directory(tmp_path)
+        
+        assert not needs_update
+        
+        os.utime(tmp_path, ns=(file_ns - 2_000_000_000, file_ns - 2_000_000_000))
+        
+        needs_update, current_time, latest_time, dir_count, file_count, source_file = updater.should_update_directory(tmp_path)
+        
+        assert needs_update
+
+    def test_second_call_skips_walk(self, tmp_path):
+        """Test an up-to-date directory is not walked again while its mtime is unchanged."""
+        updater = DirectoryUpdater()
+        
+        (tmp_path / "subdir").mkdir()
+        test_file = tmp_path / "subdir" / "test.txt"
+        test_file.write_text("content")
+        os.utime(test_file, (1_700_000_000, 1_700_000_000))
+        os.utime(tmp_path, (1_700_000_000, 1_700_000_000))
+        
+        first = updater.should_update_directory(tmp_path)
+        with patch('os.scandir', wraps=os.scandir) as mock_scandir:
+            second = updater.should_update_directory(tmp_path)
+        assert mock_scandir.call_count == 0
+        assert second == first
+        assert not second[0]
+        
+        # A changed directory mtime means the record no longer applies
+        os.utime(tmp_path, (1_600_000_000, 1_600_000_000))
+        with patch('os.scandir', wraps=os.scandir) as mock_scandir:
+            needs_update, current_time, latest_time, dir_count, file_count, source_file = updater.should_update_directory(tmp_path)
+        assert mock_scandir.call_count == 2
+        assert needs_update
+        assert current_time == 1_600_000_000_000_000_000
+
+    def test_second_call_sees_new_file_below(self, tmp_path):
+        """Test a file added one level down invalidates the up-to-date record."""
+        updater = DirectoryUpdater()
+        
+        subdir = tmp_path / "subdir"
+        subdir.mkdir()
+        test_file = subdir / "test.txt"
+        test_file.write_text("content")
+        os.utime(test_file, (1_700_000_000, 1_700_000_000))
+        os.utime(subdir, (1_700_000_000, 1_700_000_000))
+        os.utime(tmp_path, (1_700_000_000, 1_700_000_000))
+        assert not updater.should_update_directory(tmp_path)[0]
+        
+        # Only subdir's mtime changes; tmp_path's stays as recorded
+        new_file = subdir / "new.txt"
+        new_file.write_text("content")
+        os.utime(new_file, (1_800_000_000, 1_800_000_000))
+        assert tmp_path.stat().st_mtime_ns == 1_700_000_000_000_000_000
+        
+        needs_update, current_time, latest_time, dir_count, file_count, source_file = updater.should_update_directory(tmp_path)
+        assert needs_update
+        assert latest_time == 1_800_000_000_000_000_000
+        assert file_count == 2
+        assert source_file == new_file
+
+    def test_up_to_date_records_bounded(self, tmp_path, monkeypatch):
+        """Test the up-to-date records are dropped when full and on close()."""
+        monkeypatch.setattr(updater_module, "UP_TO_DATE_MAX_DIRS", 3)
+        updater = DirectoryUpdater()
+        
+        trees = [tmp_path / "a", tmp_path / "b"]
+        for tree in trees:
+            (tree / "sub").mkdir(parents=True)
+            (tree / "sub" / "file.txt").write_text("content")
+            os.utime(tree / "sub" / "file.txt", (1_700_000_000, 1_700_000_000))
+            os.utime(tree / "sub", (1_700_000_000, 1_700_000_000))
+            os.utime(tree, (1_700_000_000, 1_700_000_000))
+            
+        for tree in trees:
+            assert not updater.should_update_directory(tree)[0]
+        assert list(updater._up_to_date) == [str(trees[1])]
+        assert updater._up_to_date_dirs == 2
+        
+        updater.close()
+        assert updater._up_to_date == {}
+        assert updater._up_to_date_dirs == 0
+
+    def test_uses_supplied_stat(self, tmp_path):
+        """Test a stat result passed by the caller is used instead of re-stat'ing."""
+        updater = DirectoryUpdater()
+        
+        (tmp_path / "test.txt").write_text("content")
+        current_stat = tmp_path.stat()
+        
+        with patch('os.stat', side_effect=OSError("Stat failed")):
+            needs_update, current_time, latest_time, dir_count, file_count, source_file = updater.should_update_directory(tmp_path, current_stat)
+            
+        assert current_time == current_stat.st_mtime_ns
         assert file_count == 1
 
-    def test_stat_error_handling(self, tmp_path):
+    def test_stat_error_handling(self, tmp_path, recorder):
         """Test handling stat errors."""
         updater = DirectoryUpdater()
-        mock_error = Mock()
-        updater.print_error = mock_error
+        updater.print_error = recorder
         
         # Mock stat to raise an error
-        with patch('pathlib.Path.stat', side_effect=OSError("Stat failed")):
-            needs_update, current_time, latest_time, dir_count, file_count = updater.should_update_directory(tmp_path)
+        with patch('os.stat', side_effect=OSError("Stat failed")):
+            needs_update, current_time, latest_time, dir_count, file_count, source_file = updater.should_update_directory(tmp_path)
             
             assert not needs_update
-            assert current_time == 0.0
-            assert latest_time == 0.0
+            assert current_time == 0
+            assert latest_time == 0
             assert dir_count == 0
             assert file_count == 0
-            mock_error.assert_called_once()
+            assert source_file is None
+            recorder.assert_called_once()
 
 
 class TestUpdateDirectoryDate:
@@ -243,7 +697,7 @@ class TestUpdateDirectoryDate:
         """Test update in dry run mode."""
         updater = DirectoryUpdater(dry_run=True)
         
-        new_time = time.time()
+        new_time = time.time_ns()
         result = updater.update_directory_date(tmp_path, new_time)
         
         # Should succeed without actually changing anything
@@ -253,30 +707,50 @@ class TestUpdateDirectoryDate:
         """Test actual directory update."""
         updater = DirectoryUpdater(dry_run=False)
         
-        old_stat = tmp_path.stat()
-        new_time = time.time() + 100  # Set to future time
+        new_time = time.time_ns() + 100_000_000_123  # Set to future time
         
         result = updater.update_directory_date(tmp_path, new_time)
         
         assert result is True
-        new_stat = tmp_path.stat()
-        # Directory should have been updated (within 1 second tolerance)
-        assert abs(new_stat.st_mtime - new_time) < 1.0
+        assert tmp_path.stat().st_mtime_ns != new_time  # Queued, not yet written
+        
+        assert updater.flush_updates() == 1
+        # Nanoseconds round-trip without float rounding
+        assert tmp_path.stat().st_mtime_ns == new_time
 
-    def test_update_failure(self, tmp_path):
+    def test_update_failure(self, tmp_path, recorder):
         """Test handling update failures."""
         updater = DirectoryUpdater(dry_run=False)
-        mock_error = Mock()
-        updater.print_error = mock_error
+        updater.print_error = recorder
         
-        new_time = time.time()
+        new_time = time.time_ns()
         
         # Mock os.utime to raise an error
         with patch('os.utime', side_effect=OSError("Update failed")):
-            result = updater.update_directory_date(tmp_path, new_time)
+            assert updater.update_directory_date(tmp_path, new_time) is True
+            result = updater.flush_updates()
+            
+            assert result == 0
+            recorder.assert_called_once()
+
+    def test_batched_flush_order(self, tmp_path):
+        """Test queued updates are applied deepest directory first."""
+        updater = DirectoryUpdater(dry_run=False)
+        
+        middle = tmp_path / "a"
+        deepest = middle / "b"
+        deepest.mkdir(parents=True)
+        
+        for directory in (tmp_path, deepest, middle):
+            updater.update_directory_date(directory, 1_000_000_000_000_000_000)
             
-            assert result is False
-            mock_error.assert_called_once()
+        with patch('os.utime', wraps=os.utime) as mock_utime:
+            assert updater.flush_updates() == 3
+            
+        assert [call.args[0] for call in mock_utime.call_args_list] == [
+            str(deepest), str(middle), str(tmp_path)
+        ]
+        assert tmp_path.stat().st_mtime_ns == 1_000_000_000_000_000_000
 
 
 class TestProcessDirectory:
@@ -297,85 +771,421 @@ class TestProcessDirectory:
         result = updater.process_directory(tmp_path)
         assert result >= 0  # Should return number of changes
 
-    def test_process_nested_directories(self, tmp_path):
+    def test_process_nested_directories(self, nested_tree, recorder):
         """Test processing nested directory structure."""
-        updater = DirectoryUpdater(verbosity=2)
+        updater = DirectoryUpdater(verbosity=2, print_colored=recorder)
         
-        # Create nested structure
-        subdir1 = tmp_path / "subdir1"
-        subdir2 = subdir1 / "subdir2"
-        subdir1.mkdir()
-        subdir2.mkdir()
+        # No directory was dated from its files, so a dry run would update all three
+        result = updater.process_directory(nested_tree)
+        assert result == 3
+
+    def test_process_with_verbosity_0(self, nested_tree, recorder):
+        """Test processing with verbosity level 0."""
+        updater = DirectoryUpdater(verbosity=0, print_colored=recorder)
         
-        # Create files at different levels
-        (tmp_path / "root.txt").write_text("root")
-        (subdir1 / "sub1.txt").write_text("sub1")
-        (subdir2 / "sub2.txt").write_text("sub2")
+        updater.process_directory(nested_tree)
         
-        result = updater.process_directory(tmp_path)
-        assert result >= 0
+        # At verbosity 0 only the final statistics are printed, not per directory
+        assert recorder.call_count == 0
 
-    def test_process_with_verbosity_0(self, tmp_path):
-        """Test processing with verbosity level 0."""
-        mock_print = Mock()
-        updater = DirectoryUpdater(verbosity=0, print_colored=mock_print)
+    def test_process_with_verbosity_1(self, nested_tree, recorder):
+        """Test processing with verbosity level 1."""
+        updater = DirectoryUpdater(verbosity=1, print_colored=recorder)
+        
+        updater.process_directory(nested_tree)
+        
+        # Should print first level directories (root and immediate subdirs)
+        assert recorder.call_count == 2
+
+    def test_process_with_verbosity_2(self, nested_tree, recorder):
+        """Test processing with verbosity level 2."""
+        updater = DirectoryUpdater(verbosity=2, print_colored=recorder)
+        
+        updater.process_directory(nested_tree)
+        
+        # Should print all directories
+        assert recorder.call_count == 3
+
+    def test_process_with_verbosity_3(self, tmp_path, recorder):
+        """Test verbosity level 3 reports the source file with its mtime."""
+        updater = DirectoryUpdater(verbosity=3, print_colored=recorder)
         
         test_file = tmp_path / "test.txt"
         test_file.write_text("content")
+        os.utime(test_file, (1_000_000_000, 1_000_000_000))
         
         updater.process_directory(tmp_path)
         
-        # At verbosity 0, should be mostly quiet except for root level
-        assert mock_print.call_count >= 0
+        expected = f"  Source file: {test_file} ({updater._format_timestamp(1_000_000_000)})"
+        recorder.assert_any_call(expected, "")
 
-    def test_process_with_verbosity_1(self, tmp_path):
-        """Test processing with verbosity level 1."""
-        mock_print = Mock()
-        updater = DirectoryUpdater(verbosity=1, print_colored=mock_print)
+    def test_process_shows_subsecond_difference(self, tmp_path, recorder):
+        """Test an update within the same second prints the fractional seconds."""
+        updater = DirectoryUpdater(verbosity=2, print_colored=recorder)
         
-        # Create nested structure
-        subdir = tmp_path / "subdir"
-        subdir.mkdir()
-        (subdir / "test.txt").write_text("content")
+        test_file = tmp_path / "test.txt"
+        test_file.write_text("content")
+        os.utime(test_file, ns=(1_000_000_000_500_000_000, 1_000_000_000_500_000_000))
+        os.utime(tmp_path, ns=(1_000_000_000_250_000_000, 1_000_000_000_250_000_000))
         
         updater.process_directory(tmp_path)
         
-        # Should print first level directories (root and immediate subdirs)
-        assert mock_print.call_count >= 1  # Should print at least the root and subdir
+        second = updater._format_timestamp(1_000_000_000)
+        expected = f"Would update {tmp_path}: {second}.250000000 -> {second}.500000000 (dirs:0 files:1)"
+        recorder.assert_any_call(expected, Fore.CYAN)
 
-    def test_process_with_verbosity_2(self, tmp_path):
-        """Test processing with verbosity level 2."""
-        mock_print = Mock()
-        updater = DirectoryUpdater(verbosity=2, print_colored=mock_print)
+    def test_process_buffers_output(self, tmp_path, recorder):
+        """Test buffered status lines are printed together with their colors."""
+        updater = DirectoryUpdater(verbosity=2, print_colored=recorder, buffer_lines=64)
         
-        # Create nested structure
-        subdir = tmp_path / "subdir"
-        subdir.mkdir()
-        (subdir / "test.txt").write_text("content")
+        for name in ("a", "b", "c"):
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "file.txt").write_text("content")
+        os.utime(tmp_path, (1_000_000_000, 1_000_000_000))
+        
+        with patch.object(updater_module.time, 'monotonic', return_value=updater._out_flushed_at):
+            updater.process_directory(tmp_path)
+            
+        recorder.assert_called_once()
+        block, color = recorder.call_args.args
+        lines = block.split("\n")
+        assert len(lines) == 4
+        assert lines[-1].startswith(f"{updater_module.Fore.CYAN}Would update {tmp_path}:")
+        assert color == ""
+
+    def test_buffered_output_flushed_before_errors(self):
+        """Test errors are printed after the status lines buffered before them."""
+        events = []
+        updater = DirectoryUpdater(
+            print_colored=lambda message, color: events.append(message),
+            print_error=lambda message: events.append(message),
+            buffer_lines=64,
+        )
+        
+        with patch.object(updater_module.time, 'monotonic', return_value=updater._out_flushed_at):
+            updater._emit("first")
+            updater._emit("second")
+            assert events == []
+            updater.print_error("failed")
+            updater.flush_logs()
+            
+        assert events == ["first\nsecond", "failed"]
+
+    def test_buffered_output_written_by_output_thread(self, tmp_path):
+        """Test buffered lines are printed off the scanning thread, and flush_logs() waits for them."""
+        printed_on = []
+        updater = DirectoryUpdater(
+            verbosity=2,
+            print_colored=lambda message, color: printed_on.append(threading.get_ident()),
+            buffer_lines=1,
+        )
+        (tmp_path / "subdir").mkdir()
         
         updater.process_directory(tmp_path)
         
-        # Should print all directories
-        assert mock_print.call_count >= 0
+        # process_directory() returns only once its output has been printed
+        assert len(printed_on) == 2
+        assert threading.get_ident() not in printed_on
+        updater.close()
+        assert updater._out_thread is None
+
+    def test_output_thread_error_raised_by_flush_logs(self):
+        """Test an exception from a print function surfaces in flush_logs()."""
+        def failing_print(message, color):
+            raise BrokenPipeError("closed")
+            
+        updater = DirectoryUpdater(print_colored=failing_print, buffer_lines=1)
+        updater._emit("line")
+        
+        with pytest.raises(BrokenPipeError):
+            updater.flush_logs()
+        updater.close()
+
+    def test_process_wide_directory_in_parallel(self, tmp_path):
+        """Test wide directories are fanned out to the thread pool."""
+        updater = DirectoryUpdater(dry_run=True)
+        
+        old_time = time.time() - 100
+        for i in range(PARALLEL_MIN_FANOUT + 2):
+            subdir = tmp_path / f"subdir{i}"
+            subdir.mkdir()
+            (subdir / "file.txt").write_text("content")
+            os.utime(subdir, (old_time, old_time))
+        os.utime(tmp_path, (old_time, old_time))
+        
+        try:
+            result = updater.process_directory(tmp_path)
+            assert updater._executor is not None
+        finally:
+            updater.close()
+        
+        # Every subdirectory plus the root would be updated
+        assert result == PARALLEL_MIN_FANOUT + 3
+        assert updater._executor is None
+
+    def test_parallel_stat(self, tmp_path):
+        """Test each of many sibling directories is scanned on the worker pool."""
+        updater = DirectoryUpdater(stat_workers=4)
+        
+        for i in range(1000):
+            (tmp_path / f"subdir{i}").mkdir()
+            
+        with patch.object(updater_module.ThreadPoolExecutor, 'submit', autospec=True,
+                          side_effect=updater_module.ThreadPoolExecutor.submit) as mock_submit:
+            try:
+                tree = updater.collect_tree(tmp_path)
+            finally:
+                updater.close()
+                
+        assert mock_submit.call_count == 1000
+        assert len(tree.paths) == 1001
+
+    def test_single_stat_worker_scans_inline(self, tmp_path):
+        """Test stat_workers=1 never starts the thread pool."""
+        updater = DirectoryUpdater(stat_workers=1)
+        
+        for i in range(PARALLEL_MIN_FANOUT + 2):
+            (tmp_path / f"subdir{i}").mkdir()
+            
+        tree = updater.collect_tree(tmp_path)
+        
+        assert len(tree.paths) == PARALLEL_MIN_FANOUT + 3
+        assert updater._executor is None
 
-    def test_process_directory_listing_error(self, tmp_path):
+    def test_scans_in_flight_bounded(self, tmp_path, monkeypatch):
+        """Test no more than MAX_SCANS_IN_FLIGHT scans are queued at once."""
+        monkeypatch.setattr(updater_module, 'MAX_SCANS_IN_FLIGHT', 2)
+        updater = DirectoryUpdater(dry_run=True)
+        
+        for i in range(PARALLEL_MIN_FANOUT + 2):
+            (tmp_path / f"subdir{i}" / "nested").mkdir(parents=True)
+            
+        submitted = []
+        outstanding = []
+        executor = updater._get_executor()
+        real_submit = executor.submit
+        
+        def tracking_submit(*args):
+            submitted.append(args[1])
+            outstanding.append(args[1])
+            assert len(outstanding) <= 2
+            future = real_submit(*args)
+            future.add_done_callback(lambda _: outstanding.remove(args[1]))
+            return future
+            
+        try:
+            with patch.object(executor, 'submit', side_effect=tracking_submit):
+                tree = updater.collect_tree(tmp_path)
+        finally:
+            updater.close()
+            
+        # Every directory below the root went through the pipeline exactly once
+        assert sorted(submitted) == sorted(tree.paths[1:])
+        assert len(tree.paths) == 2 * (PARALLEL_MIN_FANOUT + 2) + 1
+
+    def test_each_directory_listed_once(self, branched_tree, recorder):
+        """Test a single scandir pass per directory serves both recursion and totals.
+        
+        Directories are stat'd from their parent's listing, never separately.
+        """
+        root = branched_tree
+        updater = DirectoryUpdater(verbosity=2, print_colored=recorder)
+        
+        with (
+            patch.object(updater_module, 'scan_entries', wraps=scan_entries) as mock_scan,
+            patch('os.stat', wraps=os.stat) as mock_stat,
+            patch('os.lstat', wraps=os.lstat) as mock_lstat,
+        ):
+            updater.process_directory(root)
+            
+        scanned = sorted(call.args[0] for call in mock_scan.call_args_list)
+        expected = sorted(
+            str(path) for path in
+            [root, root / "a", root / "a" / "nested", root / "b", root / "b" / "nested"]
+        )
+        assert scanned == expected
+        # Only the root needs a stat of its own
+        assert [call.args[0] for call in mock_stat.call_args_list] == [str(root)]
+        mock_lstat.assert_not_called()
+
+    def test_quiet_dry_run_counts_only(self, tmp_path, recorder):
+        """Test a quiet dry run counts the same directories without the full sweep."""
+        old_time = time.time() - 100
+        for name in ("stale", "current"):
+            subdir = tmp_path / name
+            subdir.mkdir()
+            (subdir / "file.txt").write_text("content")
+        os.utime(tmp_path / "stale", (old_time, old_time))
+        file_ns = (tmp_path / "current" / "file.txt").stat().st_mtime_ns
+        os.utime(tmp_path / "current", ns=(file_ns, file_ns))
+        os.utime(tmp_path, ns=(file_ns, file_ns))
+        
+        verbose_result = DirectoryUpdater(verbosity=2, print_colored=recorder).process_directory(tmp_path)
+        
+        updater = DirectoryUpdater(verbosity=0)
+        with patch.object(updater, '_process_collected') as mock_process:
+            result = updater.process_directory(tmp_path)
+            
+        mock_process.assert_not_called()
+        assert result == verbose_result == 1
+
+    @pytest.mark.parametrize("tolerance", [0.0, 5.0])
+    def test_numpy_backend_equivalence(self, tmp_path, monkeypatch, tolerance):
+        """Test the numpy fold counts the same directories as the Python loop."""
+        pytest.importorskip("numpy")
+        
+        for index, name in enumerate(("a", "a/b", "a/b/c", "a/d", "e", "e/f", "g")):
+            directory = tmp_path / name
+            directory.mkdir()
+            (directory / "file.txt").write_text("content")
+            file_ns = 1_700_000_000_000_000_000 + index * 3_000_000_000
+            os.utime(directory / "file.txt", ns=(file_ns, file_ns))
+        # Some directories already match their newest file, some are stale
+        for name, dir_ns in (("a/b/c", 1_700_000_006_000_000_000), ("e/f", 1_700_000_014_000_000_000)):
+            os.utime(tmp_path / name, ns=(dir_ns, dir_ns))
+        (tmp_path / "g" / "unreadable").mkdir()
+        
+        updater = DirectoryUpdater(tolerance=tolerance)
+        tree = updater.collect_tree(tmp_path)
+        tree.readable[-1] = False
+        
+        monkeypatch.setattr(updater_module, "NUMPY_MIN_DIRS", 0)
+        with patch.object(updater, '_count_updates_numpy', wraps=updater._count_updates_numpy) as mock_numpy:
+            numpy_count = updater._count_updates(tree)
+        mock_numpy.assert_called_once()
+        
+        monkeypatch.setattr(updater_module, "NUMPY_MIN_DIRS", len(tree.paths) + 1)
+        python_count = updater._count_updates(tree)
+        
+        assert numpy_count == python_count
+        assert 0 < python_count < len(tree.paths)
+
+    def test_each_file_stated_once(self, branched_tree, recorder):
+        """Test each entry of a 3-level tree is stat'd exactly once per run."""
+        updater = DirectoryUpdater(verbosity=2, print_colored=recorder)
+        
+        stat_calls = []
+        opened = {}
+        real_open = os.open
+        real_scandir = os.scandir
+        
+        class CountingEntry:
+            def __init__(self, entry, directory):
+                self._entry = entry
+                self._directory = directory
+                self.name = entry.name
+                self.path = entry.path
+                
+            def stat(self, **kwargs):
+                stat_calls.append(os.path.join(self._directory, self.name))
+                return self._entry.stat(**kwargs)
+                
+            def is_dir(self, **kwargs):
+                return self._entry.is_dir(**kwargs)
+                
+        def recording_open(path, *args, **kwargs):
+            fd = real_open(path, *args, **kwargs)
+            opened[fd] = path
+            return fd
+            
+        @contextlib.contextmanager
+        def counting_scandir(listing):
+            # Listed either by path or through a descriptor from os.open()
+            directory = opened.get(listing, listing)
+            with real_scandir(listing) as entries:
+                yield [CountingEntry(entry, directory) for entry in entries]
+                
+        with (
+            patch('os.open', side_effect=recording_open),
+            patch('os.scandir', side_effect=counting_scandir),
+        ):
+            updater.process_directory(branched_tree)
+            
+        entries = [str(path) for path in branched_tree.rglob("*")]
+        # 5 files and 4 directories below the root
+        assert len(entries) == 9
+        assert sorted(stat_calls) == sorted(entries)
+
+    def test_process_deeper_than_recursion_limit(self, tmp_path):
+        """Test trees deeper than the remaining recursion budget are handled iteratively."""
+        depth = 200
+        current = tmp_path
+        for _ in range(depth):
+            current = current / "d"
+            current.mkdir()
+        (current / "deep.txt").write_text("content")
+        # Older than every directory, so each one in the chain needs an update
+        os.utime(current / "deep.txt", (1_700_000_000, 1_700_000_000))
+
+        updater = DirectoryUpdater(dry_run=True)
+        old_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(len(inspect.stack()) + 50)
+        try:
+            latest_time, dir_count, file_count, source_file = updater.get_latest_modification_time(tmp_path)
+            result = updater.process_directory(tmp_path)
+        finally:
+            sys.setrecursionlimit(old_limit)
+            
+        assert file_count == 1
+        assert source_file == current / "deep.txt"
+        assert result == depth + 1
+
+    def test_dirfd_walk_deep(self, tmp_path):
+        """Test a 20-level tree is scanned and updated correctly through directory fds."""
+        base_ns = 1_000_000_000_000_000_000
+        levels = []
+        current = tmp_path
+        for level in range(20):
+            current = current / f"level{level}"
+            current.mkdir()
+            levels.append(current)
+        for level, directory in enumerate(levels):
+            # The newest file sits halfway down; deeper files get older
+            file_ns = base_ns + (level if level <= 10 else -level)
+            test_file = directory / "file.txt"
+            test_file.write_text("content")
+            os.utime(test_file, ns=(file_ns, file_ns))
+            
+        updater = DirectoryUpdater(dry_run=False)
+        with patch('os.open', wraps=os.open) as mock_open:
+            result = updater.process_directory(levels[0])
+            
+        assert result == 20
+        for level, directory in enumerate(levels):
+            expected_ns = base_ns + (10 if level <= 10 else -level)
+            assert directory.stat().st_mtime_ns == expected_ns
+        if updater_module.SCANDIR_FD:
+            assert [call.args[0] for call in mock_open.call_args_list] == [str(path) for path in levels]
+
+    def test_process_str_path(self, tmp_path):
+        """Test processing a directory given as a plain string path."""
+        updater = DirectoryUpdater(dry_run=False)
+        
+        test_file = tmp_path / "test.txt"
+        test_file.write_text("content")
+        os.utime(test_file, (1_000_000_000, 1_000_000_000))
+        
+        result = updater.process_directory(str(tmp_path))
+        
+        assert result == 1
+        assert tmp_path.stat().st_mtime == 1_000_000_000
+
+    def test_process_directory_listing_error(self, tmp_path, recorder):
         """Test handling directory listing errors."""
         updater = DirectoryUpdater()
-        mock_error = Mock()
-        updater.print_error = mock_error
+        updater.print_error = recorder
         
-        # Mock iterdir to raise an error
-        with patch('pathlib.Path.iterdir', side_effect=OSError("List failed")):
+        # Mock scandir to raise an error
+        with patch('os.scandir', side_effect=OSError("List failed")):
             result = updater.process_directory(tmp_path)
             
             assert result == 0
-            mock_error.assert_called_once()
+            recorder.assert_called_once()
 
-    def test_process_with_actual_updates(self, tmp_path):
+    def test_process_with_actual_updates(self, tmp_path, recorder):
         """Test processing with actual updates enabled."""
         updater = DirectoryUpdater(dry_run=False, verbosity=1)
-        mock_success = Mock()
-        updater.print_success = mock_success
+        updater.print_success = recorder
         
         # Create test file
         test_file = tmp_path / "test.txt"
@@ -388,11 +1198,53 @@ class TestProcessDirectory:
         result = updater.process_directory(tmp_path)
         assert result >= 0
 
-    def test_process_update_failure(self, tmp_path):
+    def test_updates_applied_after_sweep(self, tmp_path):
+        """Test queued updates are applied together once every directory is checked."""
+        events = []
+        updater = DirectoryUpdater(
+            dry_run=False,
+            verbosity=1,
+            print_colored=lambda message, color: events.append(message.split()[0]),
+            print_success=lambda message: events.append(message.split()[0]),
+        )
+        
+        subdir = tmp_path / "subdir"
+        subdir.mkdir()
+        (subdir / "test.txt").write_text("content")
+        os.utime(subdir / "test.txt", (1_000_000_000, 1_000_000_000))
+        
+        result = updater.process_directory(tmp_path)
+        
+        assert result == 2
+        assert events == ["Updating", "Updating", "Updated", "Updated"]
+        assert subdir.stat().st_mtime == 1_000_000_000
+        assert tmp_path.stat().st_mtime == 1_000_000_000
+
+    def test_updates_applied_in_batches(self, tmp_path, monkeypatch):
+        """Test a full batch of queued updates is applied during the sweep."""
+        monkeypatch.setattr(updater_module, "UTIME_BATCH_SIZE", 1)
+        events = []
+        updater = DirectoryUpdater(
+            dry_run=False,
+            verbosity=1,
+            print_colored=lambda message, color: events.append(message.split()[0]),
+            print_success=lambda message: events.append(message.split()[0]),
+        )
+        
+        subdir = tmp_path / "subdir"
+        subdir.mkdir()
+        (subdir / "test.txt").write_text("content")
+        os.utime(subdir / "test.txt", (1_000_000_000, 1_000_000_000))
+        
+        result = updater.process_directory(tmp_path)
+        
+        assert result == 2
+        assert events == ["Updating", "Updated", "Updating", "Updated"]
+
+    def test_process_update_failure(self, tmp_path, recorder):
         """Test processing when updates fail."""
         updater = DirectoryUpdater(dry_run=False)
-        mock_error = Mock()
-        updater.print_error = mock_error
+        updater.print_error = recorder
         
         # Create test file
         test_file = tmp_path / "test.txt"
@@ -402,11 +1254,11 @@ class TestProcessDirectory:
         old_time = time.time() - 100
         os.utime(tmp_path, (old_time, old_time))
         
-        # Mock update_directory_date to fail
-        with patch.object(updater, 'update_directory_date', return_value=False):
+        # Mock os.utime to fail when the queued update is applied
+        with patch('os.utime', side_effect=OSError("Update failed")):
             result = updater.process_directory(tmp_path)
             assert result == 0  # No successful updates
-            mock_error.assert_called()
+            recorder.assert_called()
 
 
 class TestFormatTimestamp:
@@ -426,70 +1278,74 @@ class TestFormatTimestamp:
         # Should contain date components
         assert "2021" in result or "2020" in result  # Account for timezone
 
+    def test_format_timestamp_matches_datetime(self):
+        """Test cached formatting matches datetime and tracks new values."""
+        import datetime
+        
+        updater = DirectoryUpdater()
+        
+        for timestamp in (1609459200.0, 1609459200.9, 1700000000.5, 1609459200.0):
+            expected = datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+            assert updater._format_timestamp(timestamp) == expected
+
 
 class TestPrintStatistics:
     """Test print_statistics method."""
 
-    def test_statistics_dry_run_zero_changes(self):
+    def test_statistics_dry_run_zero_changes(self, recorder):
         """Test statistics output for dry run with zero changes."""
-        mock_success = Mock()
-        updater = DirectoryUpdater(dry_run=True, print_success=mock_success)
+        updater = DirectoryUpdater(dry_run=True, print_success=recorder)
         
         updater.print_statistics(0, 1.5)
         
-        mock_success.assert_called_once_with("No directory dates need updating.")
+        recorder.assert_called_once_with("No directory dates need updating.")
 
-    def test_statistics_dry_run_single_change(self):
+    def test_statistics_dry_run_single_change(self, recorder):
         """Test statistics output for dry run with one change."""
-        mock_colored = Mock()
-        updater = DirectoryUpdater(dry_run=True, print_colored=mock_colored)
+        updater = DirectoryUpdater(dry_run=True, print_colored=recorder)
         
         updater.print_statistics(1, 2.0)
         
         # Should call print_colored for the change count
-        assert mock_colored.call_count >= 1
+        recorder.assert_any_call("1 directory date would be updated.", updater_module.Fore.CYAN)
 
-    def test_statistics_dry_run_multiple_changes(self):
+    def test_statistics_dry_run_multiple_changes(self, recorder):
         """Test statistics output for dry run with multiple changes."""
-        mock_colored = Mock()
-        updater = DirectoryUpdater(dry_run=True, print_colored=mock_colored)
+        updater = DirectoryUpdater(dry_run=True, print_colored=recorder)
         
         updater.print_statistics(5, 3.2)
         
         # Should call print_colored for the change count
-        assert mock_colored.call_count >= 1
+        recorder.assert_any_call("5 directory dates would be updated.", updater_module.Fore.CYAN)
 
-    def test_statistics_actual_run_zero_changes(self):
+    def test_statistics_actual_run_zero_changes(self, recorder):
         """Test statistics output for actual run with zero changes."""
-        mock_success = Mock()
-        updater = DirectoryUpdater(dry_run=False, print_success=mock_success)
+        updater = DirectoryUpdater(dry_run=False, print_success=recorder)
         
         updater.print_statistics(0, 1.0)
         
-        mock_success.assert_called_once_with("No directory dates needed updating.")
+        recorder.assert_called_once_with("No directory dates needed updating.")
 
-    def test_statistics_actual_run_single_change(self):
+    def test_statistics_actual_run_single_change(self, recorder):
         """Test statistics output for actual run with one change."""
-        mock_success = Mock()
-        updater = DirectoryUpdater(dry_run=False, print_success=mock_success)
+        updater = DirectoryUpdater(dry_run=False, print_success=recorder)
         
         updater.print_statistics(1, 1.0)
         
-        mock_success.assert_called_once_with("1 directory date was updated.")
+        recorder.assert_called_once_with("1 directory date was updated.")
 
-    def test_statistics_actual_run_multiple_changes(self):
+    def test_statistics_actual_run_multiple_changes(self, recorder):
         """Test statistics output for actual run with multiple changes."""
-        mock_success = Mock()
-        updater = DirectoryUpdater(dry_run=False, print_success=mock_success)
+        updater = DirectoryUpdater(dry_run=False, print_success=recorder)
         
         updater.print_statistics(3, 2.5)
         
-        mock_success.assert_called_once_with("3 directory dates were updated.")
+        recorder.assert_called_once_with("3 directory dates were updated.")
 
     def test_statistics_with_verbosity(self):
         """Test statistics output includes execution time with verbosity."""
-        mock_colored = Mock()
-        mock_success = Mock()
+        mock_colored = Recorder()
+        mock_success = Recorder()
         updater = DirectoryUpdater(
             verbosity=1,
             dry_run=False,
@@ -509,8 +1365,8 @@ class TestPrintStatistics:
 
     def test_statistics_execution_time_with_changes(self):
         """Test statistics always shows execution time when there are changes."""
-        mock_colored = Mock()
-        mock_success = Mock()
+        mock_colored = Recorder()
+        mock_success = Recorder()
         updater = DirectoryUpdater(
             verbosity=0,  # Low verbosity
             dry_run=False,